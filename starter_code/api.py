@@ -0,0 +1,235 @@
+#----------------------------------------------------------------------------#
+# JSON API.
+#----------------------------------------------------------------------------#
+# Read-only, versioned view of the data the pages render:
+#
+#   /api/v1/venues/<id>, /api/v1/artists/<id>    detail payloads
+#   /api/v1/venues?ids=1,2,3                      many entities, one query
+#   /api/v1/venues                                keyset-paginated list
+#   /api/v1/shows[?ids=...]                       the show list
+#   /api/v1/venues/<id>/availability?from=&to=    is it free in the window
+#   /api/v1/artists/<id>/availability?from=&to=
+#
+# ?fields=id,name,... trims every item to the listed keys. When no show
+# field is requested the shows are not loaded, and plain column fields are
+# fetched with a narrowed SELECT.
+
+from datetime import datetime, timedelta
+
+from flask import Blueprint, abort, current_app, jsonify, request
+from sqlalchemy.orm import joinedload
+
+from models import Venue, Artist, Shows
+import bookings
+import pagination
+import payloads
+import showtimes
+
+
+api = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+
+VENUE_FIELDS = ('id', 'name', 'genres', 'address', 'city', 'state', 'phone',
+                'website', 'facebook_link', 'seeking_description', 'image_link')
+ARTIST_FIELDS = ('id', 'name', 'genres', 'city', 'state', 'phone', 'website',
+                 'facebook_link', 'seeking_description', 'image_link')
+# duration in whole minutes, as the show form and the importer take it
+SHOW_FIELDS = ('show_id',) + payloads.SHOW_FIELDS + ('venue_image_link', 'duration')
+
+
+def _jsonable(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return payloads.minutes(value)
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_jsonable(v) for v in value]
+    return value
+
+
+def _error(status, message):
+    response = jsonify({"error": message})
+    response.status_code = status
+    abort(response)
+
+
+def requested_fields(allowed):
+    fields = request.args.get('fields')
+    if not fields:
+        return list(allowed)
+    fields = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        _error(400, f"unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def requested_ids():
+    ids = request.args.get('ids')
+    if ids is None:
+        return None
+    try:
+        ids = [int(i) for i in ids.split(',') if i.strip()]
+    except ValueError:
+        _error(400, 'ids must be a comma-separated list of integers')
+    if len(ids) > current_app.config['API_MAX_BATCH_IDS']:
+        _error(400, f"at most {current_app.config['API_MAX_BATCH_IDS']} ids per request")
+    return ids
+
+
+def _page(query, keys, key_of, nullable=None):
+    limit = pagination.page_size(request.args.get('limit', type=int),
+                                 current_app.config['PAGE_SIZE'],
+                                 current_app.config['PAGE_SIZE_MAX'])
+    return pagination.paginate(query, keys, key_of, limit,
+                               after=request.args.get('after'),
+                               before=request.args.get('before'),
+                               nullable=nullable)
+
+
+def _items(model, rel, payload, fields, ids):
+    # returns (items, page); page is None for a batch lookup
+    if any(f in payloads.SHOW_KEYS for f in fields):
+        query = model.query.options(joinedload(rel))
+        now = datetime.now()
+
+        def build(row):
+            data = payload(row, now)
+            return {f: data[f] for f in fields}
+    else:
+        # only the requested columns, plus the keys pagination needs
+        wanted = list(dict.fromkeys(fields + ['id', 'name']))
+        query = model.query.with_entities(*[getattr(model, f) for f in wanted])
+
+        def build(row):
+            return {f: getattr(row, f) for f in fields}
+
+    if ids is not None:
+        rows = query.filter(model.id.in_(ids)).all() if ids else []
+        by_id = {r.id: r for r in rows}
+        return [build(by_id[i]) for i in ids if i in by_id], None
+
+    page = _page(query, (model.name, model.id), lambda r: (r.name, r.id))
+    return [build(r) for r in page.items], page
+
+
+def _collection(items, page):
+    data = {"data": items}
+    if page is not None:
+        data["next_cursor"] = page.next_cursor
+        data["prev_cursor"] = page.prev_cursor
+    return jsonify(_jsonable(data))
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+VENUE_API_FIELDS = VENUE_FIELDS + payloads.SHOW_KEYS
+
+
+@api.route('/venues')
+def venues():
+    fields = requested_fields(VENUE_API_FIELDS)
+    items, page = _items(Venue, Venue.venue_show, payloads.venue_payload,
+                         fields, requested_ids())
+    return _collection(items, page)
+
+
+@api.route('/venues/<int:venue_id>')
+def venue(venue_id):
+    fields = requested_fields(VENUE_API_FIELDS)
+    items, _ = _items(Venue, Venue.venue_show, payloads.venue_payload,
+                      fields, [venue_id])
+    if not items:
+        _error(404, 'venue not found')
+    return jsonify(_jsonable(items[0]))
+
+
+#  Artists
+#  ----------------------------------------------------------------
+
+ARTIST_API_FIELDS = ARTIST_FIELDS + payloads.SHOW_KEYS
+
+
+@api.route('/artists')
+def artists():
+    fields = requested_fields(ARTIST_API_FIELDS)
+    items, page = _items(Artist, Artist.artist_show, payloads.artist_payload,
+                         fields, requested_ids())
+    return _collection(items, page)
+
+
+@api.route('/artists/<int:artist_id>')
+def artist(artist_id):
+    fields = requested_fields(ARTIST_API_FIELDS)
+    items, _ = _items(Artist, Artist.artist_show, payloads.artist_payload,
+                      fields, [artist_id])
+    if not items:
+        _error(404, 'artist not found')
+    return jsonify(_jsonable(items[0]))
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@api.route('/shows')
+def shows():
+    fields = requested_fields(SHOW_FIELDS)
+    wanted = list(dict.fromkeys(fields + ['show_id', 'start_time']))
+    query = Shows.query.with_entities(*[getattr(Shows, f) for f in wanted])
+
+    ids = requested_ids()
+    if ids is not None:
+        rows = query.filter(Shows.show_id.in_(ids)).all() if ids else []
+        by_id = {r.show_id: r for r in rows}
+        items = [payloads.show_payload(by_id[i], fields) for i in ids if i in by_id]
+        return _collection(items, None)
+
+    # by time, so shows without a start_time are left out, as on /shows
+    page = _page(query.filter(Shows.start_time.isnot(None)),
+                 (Shows.start_time, Shows.show_id),
+                 lambda s: (s.start_time, s.show_id), nullable=())
+    return _collection([payloads.show_payload(s, fields) for s in page.items], page)
+
+
+#  Availability
+#  ----------------------------------------------------------------
+
+def _availability(owner, owner_id, fk, kind):
+    # free in [from, to) unless a show's slot overlaps it; see bookings.py
+    try:
+        start = showtimes.parse_bound(request.args.get('from'))
+        end = showtimes.parse_bound(request.args.get('to'), end=True)
+    except ValueError:
+        _error(400, 'from and to must be ISO dates or datetimes')
+    if start is None or end is None or end <= start:
+        _error(400, 'from and to are required, and to must be after from')
+
+    rows = bookings.conflicts(Shows, fk, owner_id, start, end)
+    # a conflict proves the venue or artist exists
+    if not rows and owner.query.with_entities(owner.id).filter(
+            owner.id == owner_id).first() is None:
+        _error(404, f'{kind} not found')
+
+    return jsonify(_jsonable({
+        f'{kind}_id': owner_id,
+        "from": start,
+        "to": end,
+        "available": not rows,
+        "conflicts": [{"show_id": r.show_id,
+                       "start_time": r.start_time,
+                       "end_time": r.start_time + r.duration}
+                      for r in rows if r.start_time is not None],
+    }))
+
+
+@api.route('/venues/<int:venue_id>/availability')
+def venue_availability(venue_id):
+    return _availability(Venue, venue_id, Shows.venue_id, 'venue')
+
+
+@api.route('/artists/<int:artist_id>/availability')
+def artist_availability(artist_id):
+    return _availability(Artist, artist_id, Shows.artist_id, 'artist')
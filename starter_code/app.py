@@ -4,146 +4,142 @@
 #----------------------------------------------------------------------------#
 
 import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+from datetime import datetime, timedelta
+from itertools import groupby
+import os
+import sys
+from flask import Flask, Blueprint, current_app, render_template, request, Response, flash, redirect, url_for, jsonify, abort, stream_with_context
 from flask_moment import Moment
-from sqlalchemy import func
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from werkzeug.http import is_resource_modified
+from models import db, Venue, Artist, Shows, show_counts_rollover
 import logging
 from logging import Formatter, FileHandler
-from flask_wtf import Form
-from forms import *
-from flask_migrate import Migrate
+from flask.cli import AppGroup
+import click
+from formatting import DateTimeFormatter
+from cache import PageCache
+from routing import Router, reads_from_replica
+from metrics import Metrics
+from slowlog import SlowQueryLog
+import search
+import denormalize
+import counters
+import bookings
+import showtimes
+import ical
+import importer
+import exporter
+import pagination
+import dbpool
+import payloads
+import facets
+from choices import STATES, GENRES
+import assets
+import compress
+from api import api
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+# extensions are bound to an app by create_app() below
+moment = Moment()
+page_cache = PageCache()
+db_router = Router()
+metrics = Metrics()
+slow_query_log = SlowQueryLog()
+static_assets = assets.Assets()
+compression = compress.Compression()
 
-# TODO: connect to a local postgresql database
-
-#----------------------------------------------------------------------------#
-# Models.
-#----------------------------------------------------------------------------#
-
-
-class Venue(db.Model):
-    __tablename__ = 'venues'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    address = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    website = db.Column(db.String(120))
-    seeking_description = db.Column(db.String(120))
-    venue_show = db.relationship('Shows', backref='venue_show')
-
-    def __repr__(self):
-        return f'< Venue id: {self.id}, name: {self.name}, city: {self.city}, state: {self.state}, address: {self.address},phone: {self.phone}, genres: {self.genres}, image_link: {self.image_link}, facebook_link: {self.facebook_link}, website: {self.website}, seeking_description: {self.seeking_description}>'
-
-    # TODO: implement any missing fields, as a database migration using Flask-Migrate
-
-
-class Artist(db.Model):
-    __tablename__ = 'artists'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String))
-    image_link = db.Column(db.String(500))
-    website = db.Column(db.String(120))
-    facebook_link = db.Column(db.String(120))
-    seeking_description = db.Column(db.String(120))
-    artist_show = db.relationship('Shows', backref='artist_show')
-
-    def __repr__(self):
-        return f'< Artist id: {self.id}, name: {self.name}, city: {self.city}, state: {self.state},phone: {self.phone}, genres: {self.genres}, image_link: {self.image_link}, facebook_link: {self.facebook_link},website: {self.website}, seeking_description: {self.seeking_description} >'
-
-# TODO: implement any missing fields, as a database migration using Flask-Migrate
-
-# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
-
-
-class Shows(db.Model):
-    __tablename__ = 'shows'
-
-    show_id = db.Column(db.Integer, primary_key=True, nullable=False)
-    artist_id = db.Column(db.Integer, db.ForeignKey(
-        'artists.id', ondelete="CASCADE"))
-    venue_id = db.Column(db.Integer, db.ForeignKey(
-        'venues.id', ondelete="CASCADE"))
-    venue_name = db.Column(db.String)
-    artist_name = db.Column(db.String)
-    artist_image_link = db.Column(db.String(500))
-    venue_image_link = db.Column(db.String(500))
-    start_time = db.Column(db.DateTime())
-
-    def __repr__(self):
-        return f'<Shows show_id: {self.show_id}, artist_id: {self.artist_id}, venue_id: {self.venue_id}, start_time: {self.start_time}>'
+# the pages and CLI commands; cli_group=None keeps `flask import ...` etc.
+# top-level commands
+main = Blueprint('main', __name__, cli_group=None)
 
 #-------------- --------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
-
-
-app.jinja_env.filters['datetime'] = format_datetime
+# registers the `datetime` filter; compiled patterns and formatted values are
+# cached, see formatting.py
+datetime_formatter = DateTimeFormatter()
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
 
-@app.route('/')
+@main.route('/')
 def index():
     return render_template('pages/home.html')
 
 
+def list_page(query, keys, key_of, nullable=None):
+    # keyset page of a listing, driven by ?after= / ?before= / ?limit=
+    limit = pagination.page_size(request.args.get('limit', type=int),
+                                 current_app.config['PAGE_SIZE'],
+                                 current_app.config['PAGE_SIZE_MAX'])
+    return pagination.paginate(query, keys, key_of, limit,
+                               after=request.args.get('after'),
+                               before=request.args.get('before'),
+                               nullable=nullable)
+
+
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
+@main.route('/venues')
+@page_cache.cached('venues')
 def venues():
     # TODO: replace with real venues data.
     #       num_shows should be aggregated based on number of upcoming shows per venue.
 
-    venue_data = Venue.query.all()
+    # one round trip per page, keyset-paginated in area order so an area's
+    # venues stay together; upcoming shows are a maintained counter, see
+    # counters.py
+    venue_counts = db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.upcoming_shows_count.label('num_upcoming_shows'))
+
+    # ?genre=&state=&city= facets narrow the directory
+    chosen = facets.selected()
+    venue_counts = facets.apply(venue_counts, Venue, chosen)
+
+    page = list_page(venue_counts,
+                     (Venue.state, Venue.city, Venue.name, Venue.id),
+                     lambda v: (v.state, v.city, v.name, v.id))
+
     data = []
 
-    for i in venue_data:
+    # rows arrive ordered by (state, city), so each area is one contiguous run
+    for (city, state), rows in groupby(page.items, key=lambda v: (v.city, v.state)):
         data.append({
-            "city": i.city,
-            "state": i.state,
-            "venues": [{"id": i.id,
-                        "name": i.name,
-                        "num_upcoming_shows": len(db.session.query(Shows).filter(Shows.venue_id == i.id).filter(
-                            Shows.start_time > datetime.now()).all())}]})
+            "city": city,
+            "state": state,
+            "venues": [{"id": v.id,
+                        "name": v.name,
+                        "num_upcoming_shows": v.num_upcoming_shows} for v in rows]})
+
+    return render_template('pages/venues.html', areas=data, page=page,
+                           facets=facets.counts(db.session, Venue, chosen),
+                           chosen=chosen)
 
-    return render_template('pages/venues.html', areas=data)
 
+def search_limit():
+    # clients may ask for fewer results, never more than the configured cap
+    cap = current_app.config['SEARCH_RESULTS_LIMIT']
+    limit = request.form.get('limit', type=int)
+    if limit is None or limit < 1:
+        return cap
+    return min(limit, cap)
 
-@app.route('/venues/search', methods=['POST'])
+
+@main.route('/venues/search', methods=['POST'])
+@reads_from_replica
 def search_venues():
     # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
     # seach for Hop should return "The Musical Hop".
@@ -155,76 +151,26 @@ def search_venues():
     # 4- count the upcoming shows
     search_term = request.form.get('search_term', '')
 
-    venue_search = Venue.query.filter(
-        Venue.name.ilike(f'%{search_term}%')).all()
-
-    data = []
-    for v in venue_search:
-
-        data.append({
-            "name": v.name,
-            "id": v.id,
-            "num_upcoming_shows": len(db.session.query(Shows).filter(Shows.venue_id == v.id).filter(
-                Shows.start_time > datetime.now()).all())
-        })
-
-    response = {
-        "count": len(venue_search),
-        "data": data
-    }
+    response = search.search_results(Venue, search_term, search_limit())
 
     return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
 
-@app.route('/venues/<int:venue_id>')
+@main.route('/venues/<int:venue_id>')
+@page_cache.cached('venue:{venue_id}')
 def show_venue(venue_id):
     # shows the venue page with the given venue_id
     # TODO: replace with real venue data from the venues table, using venue_id
 
-    venue = Venue.query.get(venue_id)
-    data = []
-
-    past_shows = (db.session.query(Shows).filter(Shows.venue_id == venue_id).filter(
-        Shows.start_time < datetime.now()).all())
-    past = []
+    # the venue and its shows (ordered by start_time) in one query, split
+    # against a single timestamp so no show can fall between the two lists
+    venue = Venue.query.options(joinedload(Venue.venue_show)).filter(
+        Venue.id == venue_id).first_or_404()
+    data = payloads.venue_payload(venue, datetime.now())
 
-    coming_shows = (db.session.query(Shows).filter(Shows.venue_id == venue_id).filter(
-        Shows.start_time > datetime.now()).all())
-    coming = []
-
-    for i in past_shows:
-        past.append({
-            "artist_id": i.artist_id,
-            "artist_name": i.artist_name,
-            "artist_image_link": i.artist_image_link,
-            "start_time": i.start_time.strftime('%Y-%m-%d %H:%M:%S')
-        })
-
-    for i in coming_shows:
-        coming.append({
-            "artist_id": i.artist_id,
-            "artist_name": i.artist_name,
-            "artist_image_link": i.artist_image_link,
-            "start_time": i.start_time.strftime('%Y-%m-%d %H:%M:%S')
-        })
-
-    data = {
-        "id": venue.id,
-        "name": venue.name,
-        "genres": venue.genres,
-        "address": venue.address,
-        "city": venue.city,
-        "state": venue.state,
-        "phone": venue.phone,
-        "website": venue.website,
-        "facebook_link": venue.facebook_link,
-        "seeking_description": venue.seeking_description,
-        "image_link": venue.image_link,
-        "past_shows": past,
-        "upcoming_shows": coming,
-        "past_shows_count": len(past),
-        "upcoming_shows_count": len(coming)
-    }
+    # the cached page goes stale when its next upcoming show starts
+    if data["upcoming_shows"]:
+        page_cache.expire_at(data["upcoming_shows"][0]["start_time"])
 
     return render_template('pages/show_venue.html', venue=data)
 
@@ -232,17 +178,35 @@ def show_venue(venue_id):
 #  ----------------------------------------------------------------
 
 
-@app.route('/venues/create', methods=['GET'])
+def _vocabulary_error():
+    # state and genres are stored as ids from choices.py and the columns
+    # refuse anything else with a ValueError; report it on the form instead
+    state = request.form.get('state')
+    if state is not None and state not in STATES:
+        return f'Unknown state {state!r}.'
+    unknown = [g for g in request.form.getlist('genres') if g not in GENRES]
+    if unknown:
+        return 'Unknown genres: ' + ', '.join(unknown) + '.'
+    return None
+
+
+@main.route('/venues/create', methods=['GET'])
 def create_venue_form():
+    from forms import VenueForm
     form = VenueForm()
     return render_template('forms/new_venue.html', form=form)
 
 
-@app.route('/venues/create', methods=['POST'])
+@main.route('/venues/create', methods=['POST'])
 def create_venue_submission():
     # TODO: insert form data as a new Venue record in the db, instead
     # TODO: modify data to be the data object returned from db insertion
     error = False
+    invalid = _vocabulary_error()
+    if invalid:
+        from forms import VenueForm
+        flash(invalid + ' Venue could not be listed.')
+        return render_template('forms/new_venue.html', form=VenueForm()), 400
     try:
         new = Venue(
             name=request.form.get('name'),
@@ -266,11 +230,10 @@ def create_venue_submission():
         print(sys.exc_info())
         flash('An error occurred. Venue ' +
               data.name + ' could not be listed.')
-    finally:
-        db.session.close()
     if error:
         abort(500)
     else:
+        page_cache.invalidate('venues')
         flash('Venue ' + request.form['name'] + ' was successfully listed!')
         return render_template('pages/home.html')
     # on successful db insert, flash success
@@ -280,7 +243,7 @@ def create_venue_submission():
     # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
 
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@main.route('/venues/<venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
     # TODO: Complete this endpoint for taking a venue_id, and using
     # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
@@ -289,16 +252,21 @@ def delete_venue(venue_id):
     try:
 
         venue = Venue.query.get(venue_id)
+        name = venue.name
+        # ON DELETE CASCADE removes these artists' shows at this venue, and
+        # the counter triggers lower their counts (see models.Venue.venue_show)
+        artist_ids = {a for a, in db.session.query(Shows.artist_id).filter(
+            Shows.venue_id == venue.id).distinct()}
         db.session.delete(venue)
         db.session.commit()
     except():
         db.session.rollback()
         error = True
-    finally:
-        db.session.close()
     if error:
         abort(500)
     else:
+        page_cache.invalidate('venues', 'shows', f'venue:{venue_id}',
+                              *[f'artist:{a}' for a in artist_ids])
         flash('Venue, ' + name + ' successfully deleted.')
         return render_template('pages/home.html')
 
@@ -309,103 +277,61 @@ def delete_venue(venue_id):
 #  ----------------------------------------------------------------
 
 
-@app.route('/artists')
+@main.route('/artists')
+@page_cache.cached('artists')
 def artists():
     # TODO: replace with real data returned from querying the database
     # Pseudo code:
     # 1- retriving data from the database
     # 2- represent it as name and id
 
-    artists = Artist.query.all()
+    chosen = facets.selected()
+    page = list_page(facets.apply(Artist.query.with_entities(Artist.id, Artist.name),
+                                  Artist, chosen),
+                     (Artist.name, Artist.id),
+                     lambda a: (a.name, a.id))
     data = []
 
-    for a in artists:
+    for a in page.items:
         data.append({
             "name": a.name,
             "id": a.id
         })
 
-    print(data)
+    return render_template('pages/artists.html', artists=data, page=page,
+                           facets=facets.counts(db.session, Artist, chosen),
+                           chosen=chosen)
 
-    return render_template('pages/artists.html', artists=data)
 
-
-@app.route('/artists/search', methods=['POST'])
+@main.route('/artists/search', methods=['POST'])
+@reads_from_replica
 def search_artists():
     # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
     # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
     # search for "band" should return "The Wild Sax Band".
     search_term = request.form.get('search_term', '')
 
-    artist_search = Artist.query.filter(
-        Artist.name.ilike(f'%{search_term}%')).all()
-
-    data = []
-    for a in artist_search:
-
-        data.append({
-            "name": a.name,
-            "id": a.id,
-            "num_upcoming_shows": len(db.session.query(Shows).filter(Shows.artist_id == a.id).filter(
-                Shows.start_time > datetime.now()).all())
-        })
-
-    response = {
-        "count": len(artist_search),
-        "data": data
-    }
+    response = search.search_results(Artist, search_term, search_limit())
 
     return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
 
-@app.route('/artists/<int:artist_id>')
+@main.route('/artists/<int:artist_id>')
+@page_cache.cached('artist:{artist_id}')
 def show_artist(artist_id):
     # shows the venue page with the given venue_id
     # TODO: replace with real venue data from the venues table, using venue_id
 
-    artist = Artist.query.get(artist_id)
-    data = []
-
-    past_shows = (db.session.query(Shows).filter(Shows.artist_id == artist_id).filter(
-        Shows.start_time < datetime.now()).all())
-    past = []
+    # the artist and its shows (ordered by start_time) in one query, split
+    # against a single timestamp so no show can fall between the two lists
+    artist = Artist.query.options(joinedload(Artist.artist_show)).filter(
+        Artist.id == artist_id).first_or_404()
+    data = payloads.artist_payload(artist, datetime.now())
 
-    coming_shows = (db.session.query(Shows).filter(Shows.artist_id == artist_id).filter(
-        Shows.start_time > datetime.now()).all())
-    coming = []
-
-    for i in past_shows:
-        past.append({
-            "venue_id": i.venue_id,
-            "venue_name": i.venue_name,
-            "venue_image_link": i.venue_image_link,
-            "start_time": i.start_time.strftime('%Y-%m-%d %H:%M:%S')
-        })
+    # the cached page goes stale when its next upcoming show starts
+    if data["upcoming_shows"]:
+        page_cache.expire_at(data["upcoming_shows"][0]["start_time"])
 
-    for i in coming_shows:
-        coming.append({
-            "venue_id": i.venue_id,
-            "venue_name": i.venue_name,
-            "venue_image_link": i.venue_image_link,
-            "start_time": i.start_time.strftime('%Y-%m-%d %H:%M:%S')
-        })
-
-    data = {
-        "id": artist.id,
-        "name": artist.name,
-        "genres": artist.genres,
-        "city": artist.city,
-        "state": artist.state,
-        "phone": artist.phone,
-        "website": artist.website,
-        "facebook_link": artist.facebook_link,
-        "seeking_description": artist.seeking_description,
-        "image_link": artist.image_link,
-        "past_shows": past,
-        "upcoming_shows": coming,
-        "past_shows_count": len(past),
-        "upcoming_shows_count": len(coming)
-    }
     return render_template('pages/show_artist.html', artist=data)
 
 
@@ -413,8 +339,9 @@ def show_artist(artist_id):
 #  ----------------------------------------------------------------
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
+    from forms import ArtistForm
     form = ArtistForm()
     artist = Artist.query.get(artist_id)
     artist = {
@@ -433,12 +360,15 @@ def edit_artist(artist_id):
     return render_template('forms/edit_artist.html', form=form, artist=artist)
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
     # TODO: take values from the form submitted, and update existing
     # artist record with ID <artist_id> using the new attributes
+    invalid = _vocabulary_error()
+    if invalid:
+        flash(invalid + ' Artist could not be updated.')
+        return edit_artist(artist_id), 400
 
-    form = ArtistForm()
     artist = Artist.query.get(artist_id)
 
     artist.name = request.form['name']
@@ -451,13 +381,19 @@ def edit_artist_submission(artist_id):
     artist.seeking_description = request.form['seeking_description']
     artist.image_link = request.form['image_link']
 
+    # refresh the artist's name/image copies on its shows in the same commit
+    venue_ids = denormalize.propagate_artist(db.session, Shows, artist)
     db.session.commit()
+    page_cache.invalidate('artists', f'artist:{artist_id}')
+    if venue_ids:
+        page_cache.invalidate('shows', *[f'venue:{v}' for v in set(venue_ids)])
 
-    return redirect(url_for('show_artist', artist_id=artist_id))
+    return redirect(url_for('.show_artist', artist_id=artist_id))
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
+    from forms import VenueForm
     form = VenueForm()
     venue = Venue.query.get(venue_id)
     venue = {
@@ -478,11 +414,15 @@ def edit_venue(venue_id):
     return render_template('forms/edit_venue.html', form=form, venue=venue)
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
     # TODO: take values from the form submitted, and update existing
     # venue record with ID <venue_id> using the new attributes
-    form = VenueForm()
+    invalid = _vocabulary_error()
+    if invalid:
+        flash(invalid + ' Venue could not be updated.')
+        return edit_venue(venue_id), 400
+
     venue = Venue.query.get(venue_id)
 
     venue.name = request.form['name']
@@ -496,25 +436,36 @@ def edit_venue_submission(venue_id):
     venue.seeking_description = request.form['seeking_description']
     venue.image_link = request.form['image_link']
 
+    # refresh the venue's name/image copies on its shows in the same commit
+    artist_ids = denormalize.propagate_venue(db.session, Shows, venue)
     db.session.commit()
-    return redirect(url_for('show_venue', venue_id=venue_id))
+    page_cache.invalidate('venues', f'venue:{venue_id}')
+    if artist_ids:
+        page_cache.invalidate('shows', *[f'artist:{a}' for a in set(artist_ids)])
+    return redirect(url_for('.show_venue', venue_id=venue_id))
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
 
-@app.route('/artists/create', methods=['GET'])
+@main.route('/artists/create', methods=['GET'])
 def create_artist_form():
+    from forms import ArtistForm
     form = ArtistForm()
     return render_template('forms/new_artist.html', form=form)
 
 
-@app.route('/artists/create', methods=['POST'])
+@main.route('/artists/create', methods=['POST'])
 def create_artist_submission():
     # called upon submitting the new artist listing form
     # TODO: insert form data as a new Venue record in the db, instead
     # TODO: modify data to be the data object returned from db insertion
     error = False
+    invalid = _vocabulary_error()
+    if invalid:
+        from forms import ArtistForm
+        flash(invalid + ' Artist could not be listed.')
+        return render_template('forms/new_artist.html', form=ArtistForm()), 400
     try:
         new = Artist(
             name=request.form.get('name'),
@@ -536,11 +487,10 @@ def create_artist_submission():
         print(sys.exc_info())
         flash('An error occurred. Artist ' +
               data.name + ' could not be listed.')
-    finally:
-        db.session.close()
     if error:
         abort(500)
     else:
+        page_cache.invalidate('artists')
         flash('Artist ' + request.form['name'] + ' was successfully listed!')
         return render_template('pages/home.html')
     # on successful db insert, flash success
@@ -551,35 +501,90 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@main.route('/shows')
+@page_cache.cached('shows')
 def shows():
     # displays list of shows at /shows
     # TODO: replace with real venues data.
     #       num_shows should be aggregated based on number of upcoming shows per venue.
-    show = Shows.query.all()
+    # ?from=&to= narrow the list to a date range, ?venue_id=, ?artist_id=,
+    # ?city= and ?state= to a venue, artist or place; see showtimes.py
+    try:
+        chosen = showtimes.selected()
+    except ValueError:
+        abort(400)
+    # a show without a start_time has no place in a list by time; leaving it
+    # out keeps the keys non-null, so ix_shows_start_time_show_id serves the
+    # pages
+    page = list_page(showtimes.scoped(Shows.query, Shows, Venue, chosen).filter(
+                         Shows.start_time.isnot(None)),
+                     (Shows.start_time, Shows.show_id),
+                     lambda s: (s.start_time, s.show_id), nullable=())
     data = []
 
-    for s in show:
-        data.append({
-            "venue_id": s.venue_id,
-            "venue_name": s.venue_name,
-            "artist_id": s.artist_id,
-            "artist_name": s.artist_name,
-            "artist_image_link": s.artist_image_link,
-            "start_time": s.start_time.strftime('%Y-%m-%d %H:%M:%S')
-        })
+    for s in page.items:
+        data.append(payloads.show_payload(s))
+
+    return render_template('pages/shows.html', shows=data, page=page,
+                           chosen=chosen)
+
+
+def show_feed(owner, owner_id, fk):
+    # streamed .ics of one venue's or artist's shows, by default from
+    # FEED_PAST_DAYS ago on; a poll that finds nothing changed gets a 304
+    # after a single aggregate query, see ical.py
+    try:
+        start = showtimes.parse_bound(request.args.get('from'))
+        end = showtimes.parse_bound(request.args.get('to'), end=True)
+    except ValueError:
+        abort(400)
+    if start is None:
+        start = datetime.now() - timedelta(days=current_app.config['FEED_PAST_DAYS'])
+    query = showtimes.between(Shows.query.filter(fk == owner_id), Shows, start, end)
+
+    found = ical.validators(db.session, owner, owner_id, Shows, query)
+    if found is None:
+        abort(404)
+    name, last_modified, etag = found
+
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        shows = query.order_by(Shows.start_time, Shows.show_id).execution_options(
+            stream_results=True).yield_per(current_app.config['EXPORT_BATCH_SIZE'])
+        response = Response(stream_with_context(ical.feed_lines(name, shows, request.host)),
+                            mimetype=ical.MIMETYPE)
+    else:
+        response = Response(status=304)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
+
+
+@main.route('/venues/<int:venue_id>/shows.ics')
+def venue_feed(venue_id):
+    return show_feed(Venue, venue_id, Shows.venue_id)
 
-    return render_template('pages/shows.html', shows=data)
 
+@main.route('/artists/<int:artist_id>/shows.ics')
+def artist_feed(artist_id):
+    return show_feed(Artist, artist_id, Shows.artist_id)
 
-@app.route('/shows/create', methods=['GET'])
+
+@main.route('/shows/create', methods=['GET'])
 def create_shows():
     # renders form. do not touch.
+    from forms import ShowForm
     form = ShowForm()
     return render_template('forms/new_show.html', form=form)
 
 
-@app.route('/shows/create', methods=['POST'])
+def _show_form_error(message, status):
+    # the form again, filled in with what was submitted
+    from forms import ShowForm
+    flash(message)
+    return render_template('forms/new_show.html', form=ShowForm()), status
+
+
+@main.route('/shows/create', methods=['POST'])
 def create_show_submission():
     # called to create new shows in the db, upon submitting new show listing form
     # TODO: insert form data as a new Show record in the db, instead
@@ -594,21 +599,41 @@ def create_show_submission():
             artist_image_link=request.form.get('artist_image_link'),
             venue_image_link=request.form.get('venue_image_link')
         )
+        # minutes, as ShowForm's NumberRange(min=1); blank keeps the 2 hour
+        # default. The CHECK constraint would refuse the rest with a 500.
+        duration = request.form.get('duration', '').strip()
+        if duration:
+            if not duration.isdigit() or int(duration) < 1:
+                return _show_form_error(
+                    'Duration must be a whole number of minutes, at least 1. '
+                    'Show could not be listed.', 400)
+            new.duration = timedelta(minutes=int(duration))
+        denormalize.fill_show(db.session, new, Artist, Venue)
 
         db.session.add(new)
         db.session.commit()
 
+    except IntegrityError as e:
+        # the exclusion constraints refuse overlapping bookings, see bookings.py
+        db.session.rollback()
+        booked = bookings.double_booked(e)
+        if booked is None:
+            raise
+        return _show_form_error(
+            f'The {booked} is already booked at that time. Show could not be listed.', 409)
     except():
         db.session.rollback()
         error = True
         print(sys.exc_info())
         flash('An error occurred. Show could not be listed.')
 
-    finally:
-        db.session.close()
     if error:
         abort(500)
     else:
+        # /venues lists upcoming show counts
+        page_cache.invalidate('shows', 'venues',
+                              f"venue:{request.form.get('venue_id')}",
+                              f"artist:{request.form.get('artist_id')}")
         flash('Show was successfully listed!')
         return render_template('pages/home.html')
 
@@ -619,40 +644,292 @@ def create_show_submission():
     # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
 
 
-@app.errorhandler(404)
+#  Export
+#  ----------------------------------------------------------------
+
+EXPORTS = {
+    'venues': Venue,
+    'artists': Artist,
+    'shows': Shows,
+}
+
+
+def export_overlap():
+    # rows committed late by long transactions, see exporter.py
+    return timedelta(seconds=current_app.config['EXPORT_SINCE_OVERLAP_SECONDS'])
+
+
+@main.route('/export/<name>.<format>')
+def export(name, format):
+    # ?since=<ISO timestamp> limits the dump to rows changed since then
+    if name not in EXPORTS or format not in exporter.FORMATS:
+        abort(404)
+    try:
+        since = exporter.parse_since(request.args.get('since'))
+    except ValueError:
+        abort(400)
+
+    lines = exporter.export_lines(EXPORTS[name], name, format, since,
+                                  current_app.config['EXPORT_BATCH_SIZE'],
+                                  export_overlap())
+    return Response(stream_with_context(lines),
+                    mimetype=exporter.FORMATS[format],
+                    headers={'Content-Disposition':
+                             f'attachment; filename={name}.{format}'})
+
+
+#  Stats
+#  ----------------------------------------------------------------
+
+@main.route('/stats/pool')
+def pool_stats():
+    # connection pool occupancy and checkout wait times of this worker
+    return jsonify(dbpool.stats(db.engine))
+
+
+@main.route('/stats/formatting')
+def formatting_stats():
+    # hit/miss counters of the datetime filter caches
+    return jsonify(datetime_formatter.stats())
+
+
+@main.route('/stats/compression')
+def compression_stats():
+    # hit/miss counters and size of the compressed-body cache
+    return jsonify(compression.stats())
+
+
+@main.route('/metrics')
+def prometheus_metrics():
+    # latency, query and render-time metrics of this worker
+    return metrics.response()
+
+
+@main.app_errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
 
-@app.errorhandler(500)
+@main.app_errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+#----------------------------------------------------------------------------#
+# CLI.
+#----------------------------------------------------------------------------#
+
+shows_cli = AppGroup('shows', help='Maintenance of the shows table.')
+
+
+@shows_cli.command('repair')
+@click.option('--batch-size', default=10000, show_default=True,
+              help='show_id range scanned per transaction.')
+@click.option('--start-after', default=0,
+              help='Resume after this show_id (as printed by a previous run).')
+def repair_shows(batch_size, start_after):
+    """Re-copy artist/venue names and images into drifted shows rows."""
+    def progress(show_id, fixed):
+        click.echo(f'checked through show_id {show_id}: {fixed} repaired')
+
+    repaired = denormalize.repair(db.session, Shows, Artist, Venue,
+                                  batch_size=batch_size,
+                                  start_after=start_after, progress=progress)
+    if repaired:
+        page_cache.invalidate(
+            'shows',
+            *{f'artist:{a}' for a, v in repaired},
+            *{f'venue:{v}' for a, v in repaired})
+    click.echo(f'done, {len(repaired)} shows repaired')
+
+
+@shows_cli.command('rollover')
+@click.option('--batch-size', default=10000, show_default=True,
+              help='Shows moved from upcoming to past per transaction.')
+def rollover_shows(batch_size):
+    """Count shows that have started as past; run it from cron."""
+    def progress(rolled_at, venues, artists):
+        click.echo(f'rolled over through {rolled_at}: {venues} venues, '
+                   f'{artists} artists updated')
+
+    venue_ids, artist_ids = counters.rollover(
+        db.session, show_counts_rollover, Shows, Venue, Artist,
+        batch_size=batch_size, progress=progress)
+    if venue_ids:
+        # /venues lists upcoming show counts
+        page_cache.invalidate('venues')
+    click.echo(f'done, {len(venue_ids)} venues and {len(artist_ids)} artists updated')
+
+
+main.cli.add_command(shows_cli)
+
+import_cli = AppGroup('import', help='Bulk-load CSV or JSON Lines files.')
+
+
+def run_import(name, path, batch_size, max_errors):
+    def progress(result):
+        click.echo(f'{result.staged} rows staged ({result.rate:.0f} rows/s)')
+
+    try:
+        result = importer.load(db.session, name, path, batch_size=batch_size,
+                               max_errors=max_errors, progress=progress)
+    except (importer.InvalidRow, importer.Conflict) as e:
+        db.session.rollback()
+        raise click.ClickException(str(e))
+
+    for line, error in result.errors:
+        click.echo(f'line {line}: {error}', err=True)
+    click.echo(f'{result.upserted} {name} upserted, {result.skipped} skipped, '
+               f'{result.refreshed} shows refreshed in {result.seconds:.1f}s '
+               f'({result.rate:.0f} rows/s)')
+    if result.seconds > export_overlap().total_seconds():
+        # its rows are stamped with the transaction's start
+        click.echo('warning: the import ran longer than EXPORT_SINCE_OVERLAP_SECONDS; '
+                   'incremental exports taken meanwhile may miss its rows, so '
+                   'raise the overlap or run a full export', err=True)
+    page_cache.invalidate('venues', 'artists', 'shows')
+
+
+def import_command(name):
+    @import_cli.command(name, help=f'Upsert {name} from a .csv or .jsonl file.')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--batch-size', default=50000, show_default=True,
+                  help='Rows per COPY batch.')
+    @click.option('--max-errors', default=100, show_default=True,
+                  help='Abort after this many invalid rows.')
+    def command(path, batch_size, max_errors):
+        run_import(name, path, batch_size, max_errors)
+    return command
+
+
+for name in importer.ENTITIES:
+    import_command(name)
+
+main.cli.add_command(import_cli)
+
+
+assets_cli = AppGroup('assets', help='Static asset bundles.')
+
+
+@assets_cli.command('build')
+@click.option('--prune/--no-prune', default=True, show_default=True,
+              help='Remove the bundles of earlier builds.')
+def build_assets(prune):
+    """Bundle, fingerprint and precompress the layout's CSS and JS."""
+    manifest = assets.build(current_app.static_folder)
+    for name, path in sorted(manifest.items()):
+        click.echo(f'{name} -> static/{path}')
+    if prune:
+        click.echo(f'{assets.prune(current_app.static_folder, manifest)} old files removed')
+
+
+main.cli.add_command(assets_cli)
+
+
+@main.cli.command('export')
+@click.argument('name', type=click.Choice(sorted(EXPORTS)))
+@click.option('--format', 'format', type=click.Choice(sorted(exporter.FORMATS)),
+              default='jsonl', show_default=True)
+@click.option('--since', help='Only rows changed at or after this ISO timestamp.')
+@click.option('--output', type=click.File('w'), default='-',
+              help='Destination file (default: stdout).')
+def export_command(name, format, since, output):
+    """Stream venues, artists or shows as CSV or JSON Lines."""
+    try:
+        since = exporter.parse_since(since)
+    except ValueError:
+        raise click.BadParameter('expected an ISO 8601 timestamp', param_hint='--since')
+    for line in exporter.export_lines(EXPORTS[name], name, format, since,
+                                      current_app.config['EXPORT_BATCH_SIZE'],
+                                      export_overlap()):
+        output.write(line)
+
 
 #----------------------------------------------------------------------------#
-# Launch.
+# App Factory.
 #----------------------------------------------------------------------------#
 
-# Default port:
-if __name__ == '__main__':
-    app.run()
+# root options of the flask command that take a value
+FLASK_VALUE_OPTIONS = ('--app', '-A', '--env-file', '-e')
+
+
+def running_db_command():
+    # whether this process is `flask [options] db ...`
+    if not os.environ.get('FLASK_RUN_FROM_CLI'):
+        return False
+    args = iter(sys.argv[1:])
+    for arg in args:
+        if arg in FLASK_VALUE_OPTIONS:
+            next(args, None)
+        elif not arg.startswith('-'):
+            return arg == 'db'
+    return False
+
+
+def create_app(config=None):
+    # `config` overrides config.py: a dict, or an object or import path.
+    # `flask` finds this factory on its own, so FLASK_APP=app keeps working.
+    app = Flask(__name__)
+    app.config.from_object('config')
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    if not app.config.get('SECRET_KEY'):
+        if not app.debug:
+            # a per-process key breaks sessions and flashes across workers
+            raise RuntimeError('FYYUR_SECRET_KEY must be set when not debugging')
+        app.config['SECRET_KEY'] = os.urandom(32)
+
+    moment.init_app(app)
+    dbpool.init_app(app)
+    db.init_app(app)
+    if running_db_command():
+        # alembic is slow to import and only `flask db ...` needs it, so
+        # workers, tests and every other command skip Flask-Migrate
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    page_cache.init_app(app)
+    db_router.init_app(app)
+    metrics.init_app(app)
+    slow_query_log.init_app(app)
+    static_assets.init_app(app)
+    compression.init_app(app)
+    datetime_formatter.init_app(app)
+
+    # link builders for the listing templates
+    app.jinja_env.globals['page_url'] = pagination.page_url
+    app.jinja_env.globals['facet_url'] = facets.facet_url
+
+    app.register_blueprint(main)
+    app.register_blueprint(api)
+
+    if not app.debug:
+        file_handler = FileHandler('error.log')
+        file_handler.setFormatter(
+            Formatter(
+                '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+        )
+        app.logger.setLevel(logging.INFO)
+        file_handler.setLevel(logging.INFO)
+        app.logger.addHandler(file_handler)
+        app.logger.info('errors')
+
+    return app
 
-# Or specify port manually:
-'''
 
+def dispose_engines(app):
+    # drops pooled connections, so that none is shared across a fork
+    with app.app_context():
+        db.engine.dispose()
+    db_router.dispose()
+
+#----------------------------------------------------------------------------#
+# Launch.
+#----------------------------------------------------------------------------#
 
+# Development server; in production run gunicorn with gunicorn.conf.py
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
-'''
+    create_app().run(host='0.0.0.0', port=port)
@@ -0,0 +1,172 @@
+#----------------------------------------------------------------------------#
+# Static asset bundles.
+#----------------------------------------------------------------------------#
+# `flask assets build` concatenates the stylesheets and scripts of the layout
+# into a few bundles, minifies the CSS, names each file after a hash of its
+# content (static/dist/site.3f2a9c1e.css) and writes .gz and .br copies next
+# to it. templates call asset_urls('site.css'); with ASSETS_BUNDLED set it
+# returns the one fingerprinted URL listed in static/dist/manifest.json,
+# otherwise (in development, or before a build) the source files.
+#
+# A fingerprinted file never changes under its name, so it is served with a
+# year-long `immutable` Cache-Control and browsers reuse it without
+# revalidating; a build after any change produces new names. The dist/ route
+# picks the precompressed copy the client accepts. A front proxy can serve
+# the same files itself (nginx gzip_static / brotli_static).
+#
+# Brotli copies come from the `Brotli` package in requirements.txt; where it
+# is not installed only gzip is written.
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+from flask import request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+
+# bundle -> source files under static/, in load order. The bundle lands in
+# static/dist/, a sibling of css/, so relative url(../fonts/...) still works.
+BUNDLES = {
+    'site.css': ['css/bootstrap.min.css', 'css/layout.main.css', 'css/main.css',
+                 'css/main.responsive.css', 'css/main.quickfix.css'],
+    # loaded in <head>, before the page's inline scripts
+    'head.js': ['js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js'],
+    # deferred, after jQuery
+    'site.js': ['js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js', 'js/script.js'],
+}
+
+# (suffix, Content-Encoding) in order of preference
+ENCODINGS = (('.br', 'br'), ('.gz', 'gzip'))
+
+CSS_COMMENT = re.compile(r'/\*(?!!).*?\*/', re.S)
+CSS_SPACE = re.compile(r'\s+')
+CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+
+
+def minify_css(text):
+    # comments (but not /*! licences */), runs of whitespace, and spaces
+    # around punctuation that cannot change meaning; nothing cleverer
+    text = CSS_COMMENT.sub('', text)
+    text = CSS_SPACE.sub(' ', text)
+    text = CSS_PUNCTUATION.sub(r'\1', text)
+    return text.replace(';}', '}').strip()
+
+
+def bundle(static_folder, sources):
+    parts = []
+    for source in sources:
+        with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+            parts.append(f.read())
+    if sources[0].endswith('.css'):
+        return minify_css('\n'.join(parts))
+    # scripts are only concatenated; the libraries are minified already and
+    # a missing semicolon at a file's end must not join two statements
+    return '\n;\n'.join(parts)
+
+
+def _write(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build(static_folder):
+    # writes the bundles, their compressed copies and the manifest; returns
+    # the manifest ({bundle: path under static/})
+    out = os.path.join(static_folder, DIST)
+    os.makedirs(out, exist_ok=True)
+    manifest = {}
+    for name, sources in BUNDLES.items():
+        data = bundle(static_folder, sources).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()[:8]
+        stem, ext = os.path.splitext(name)
+        filename = f'{stem}.{digest}{ext}'
+        path = os.path.join(out, filename)
+
+        _write(path, data)
+        # mtime=0 keeps the .gz byte-identical from build to build
+        _write(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _write(path + '.br', brotli.compress(data, quality=11))
+        manifest[name] = f'{DIST}/{filename}'
+
+    _write(os.path.join(out, MANIFEST),
+           json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def prune(static_folder, manifest):
+    # removes bundles of earlier builds; returns how many files went
+    out = os.path.join(static_folder, DIST)
+    keep = {os.path.basename(p) for p in manifest.values()}
+    removed = 0
+    for filename in os.listdir(out):
+        base = filename
+        for suffix, _ in ENCODINGS:
+            if base.endswith(suffix):
+                base = base[:-len(suffix)]
+        if filename != MANIFEST and base not in keep:
+            os.remove(os.path.join(out, filename))
+            removed += 1
+    return removed
+
+
+class Assets(object):
+
+    def __init__(self, app=None):
+        self.manifest = None
+        self.max_age = 31536000
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        self.max_age = app.config.get('ASSETS_MAX_AGE', 31536000)
+        self.manifest = None
+        if app.config.get('ASSETS_BUNDLED'):
+            try:
+                with open(os.path.join(app.static_folder, DIST, MANIFEST)) as f:
+                    self.manifest = json.load(f)
+            except FileNotFoundError:
+                app.logger.warning('ASSETS_BUNDLED is set but there is no '
+                                   'static/dist/manifest.json; run `flask assets build`')
+
+        app.add_url_rule(f'{app.static_url_path}/{DIST}/<path:filename>',
+                         'assets', self.send)
+        app.jinja_env.globals['asset_urls'] = self.urls
+        app.extensions['assets'] = self
+
+    def urls(self, name):
+        if self.manifest is not None and name in self.manifest:
+            return [url_for('static', filename=self.manifest[name])]
+        return [url_for('static', filename=s) for s in BUNDLES[name]]
+
+    def send(self, filename):
+        folder = os.path.join(self.static_folder, DIST)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encoding = None
+        for suffix, coding in ENCODINGS:
+            if (request.accept_encodings[coding] > 0
+                    and os.path.isfile(os.path.join(folder, filename + suffix))):
+                filename, encoding = filename + suffix, coding
+                break
+
+        response = send_from_directory(folder, filename, mimetype=mimetype)
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        if filename != MANIFEST:
+            response.headers['Cache-Control'] = f'public, max-age={self.max_age}, immutable'
+        return response
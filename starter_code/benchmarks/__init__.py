@@ -0,0 +1,16 @@
+#----------------------------------------------------------------------------#
+# Benchmarks.
+#----------------------------------------------------------------------------#
+# Run from starter_code/ against a local postgres (config.py, or
+# FYYUR_DATABASE_URL) with the migrations applied:
+#
+#   python -m benchmarks.generate --scale 100k --seed 1 --load
+#   python -m benchmarks.load --mode test-client --out baseline.json
+#   python -m benchmarks.load --mode wsgi --concurrency 8 --out baseline-wsgi.json
+#   python -m benchmarks.importtime --runs 10 --out boot.json
+#
+# generate.py writes a seeded, reproducible catalogue of venues, artists and
+# shows as JSON Lines and (with --load) imports it through importer.py.
+# load.py drives every route of the app and reports p50/p95/p99 latency,
+# throughput and SQL queries per request as JSON, so two runs can be diffed.
+# importtime.py reports boot time and memory of a fresh worker.
@@ -0,0 +1,248 @@
+#----------------------------------------------------------------------------#
+# Synthetic data generator.
+#----------------------------------------------------------------------------#
+# The same --seed and --anchor always produce the same files. States and
+# genres come from the form vocabularies (choices.py); both, and the venues and
+# artists that shows are booked at, follow a skewed distribution so that a few
+# values are popular and most are rare, like a real catalogue.
+#
+#   python -m benchmarks.generate --scale 1m --seed 1 --out bench_data --load
+
+import argparse
+import json
+import os
+import random
+from datetime import date, datetime, time, timedelta
+
+from choices import STATE_CHOICES, GENRE_CHOICES
+
+
+SCALES = {
+    '1k': 1000,
+    '10k': 10000,
+    '100k': 100000,
+    '1m': 1000000,
+}
+
+STATES = [value for value, label in STATE_CHOICES]
+GENRES = [value for value, label in GENRE_CHOICES]
+
+CITIES = {
+    'CA': ['Los Angeles', 'San Francisco', 'San Diego', 'Oakland', 'Sacramento'],
+    'NY': ['New York', 'Brooklyn', 'Buffalo', 'Rochester'],
+    'TX': ['Austin', 'Houston', 'Dallas', 'San Antonio'],
+    'IL': ['Chicago', 'Evanston'],
+    'WA': ['Seattle', 'Tacoma', 'Spokane'],
+    'TN': ['Nashville', 'Memphis'],
+    'LA': ['New Orleans', 'Baton Rouge'],
+    'GA': ['Atlanta', 'Savannah'],
+    'CO': ['Denver', 'Boulder'],
+    'OR': ['Portland', 'Eugene'],
+    'MA': ['Boston', 'Cambridge'],
+    'FL': ['Miami', 'Orlando', 'Tampa'],
+}
+# place names found in many states
+COMMON_CITIES = ['Springfield', 'Franklin', 'Greenville', 'Clinton', 'Madison',
+                 'Salem', 'Fairview', 'Georgetown', 'Riverside', 'Oxford']
+
+ADJECTIVES = ['Blue', 'Golden', 'Velvet', 'Electric', 'Silver', 'Crimson',
+              'Lonesome', 'Midnight', 'Wild', 'Painted', 'Hollow', 'Neon',
+              'Broken', 'Quiet', 'Burning', 'Rusty', 'Lucky', 'Howling']
+NOUNS = ['Owl', 'Lantern', 'Anchor', 'Crow', 'Fox', 'Harbor', 'River',
+         'Engine', 'Garden', 'Mirror', 'Coyote', 'Comet', 'Orchard', 'Tide',
+         'Signal', 'Parlor', 'Canyon', 'Horizon']
+VENUE_KINDS = ['Hall', 'Room', 'Lounge', 'Theatre', 'Tavern', 'Club',
+               'Ballroom', 'Social Club', 'Music Hall', 'Bar']
+FIRST_NAMES = ['Ava', 'Miles', 'Nina', 'Otis', 'June', 'Etta', 'Gram', 'Lou',
+               'Patsy', 'Ray', 'Sam', 'Joni', 'Hank', 'Billie', 'Ella', 'Townes']
+LAST_NAMES = ['Reed', 'Harper', 'Cole', 'Vance', 'Holloway', 'Quinn', 'Marsh',
+              'Bishop', 'Lane', 'Fletcher', 'Moreno', 'Okafor', 'Lindqvist']
+STREETS = ['Main St', 'Mission St', 'Broadway', 'Market St', 'Elm St',
+           'Oak Ave', 'Valencia St', 'Frenchmen St', 'Sixth St', 'Lake Shore Dr']
+
+
+def zipf_weights(n, s=1.1):
+    return [1 / (rank + 1) ** s for rank in range(n)]
+
+
+def skewed_index(rng, n, skew=2.0):
+    # 0..n-1, low indexes far more likely
+    return min(int(n * rng.random() ** skew), n - 1)
+
+
+class Generator(object):
+
+    def __init__(self, seed, anchor):
+        self.rng = random.Random(seed)
+        self.anchor = anchor
+        # popularity order differs per seed, but is fixed for a given seed
+        self.states = STATES[:]
+        self.rng.shuffle(self.states)
+        self.state_weights = zipf_weights(len(self.states))
+        self.genres = GENRES[:]
+        self.rng.shuffle(self.genres)
+        self.genre_weights = zipf_weights(len(self.genres))
+        # (venue or artist index, day) pairs already booked
+        self.venue_days = set()
+        self.artist_days = set()
+
+    def place(self):
+        state = self.rng.choices(self.states, self.state_weights)[0]
+        city = self.rng.choice(CITIES.get(state) or COMMON_CITIES)
+        return city, state
+
+    def pick_genres(self):
+        chosen = []
+        for _ in range(self.rng.choice((1, 1, 2, 2, 3))):
+            genre = self.rng.choices(self.genres, self.genre_weights)[0]
+            if genre not in chosen:
+                chosen.append(genre)
+        return chosen
+
+    def phone(self):
+        r = self.rng.randint
+        return f'{r(200, 999)}-{r(200, 999)}-{r(1000, 9999)}'
+
+    def slug(self, name):
+        return ''.join(c for c in name.lower() if c.isalnum())
+
+    def links(self, name, kind, id):
+        slug = self.slug(name)
+        return {
+            'image_link': f'https://picsum.photos/seed/{kind}{id}/300/300',
+            'facebook_link': f'https://www.facebook.com/{slug}{id}',
+            'website': f'https://www.{slug}.example' if self.rng.random() < 0.6 else None,
+            'seeking_description': (f'{name} is looking for new {"artists" if kind == "venue" else "venues"}.'
+                                    if self.rng.random() < 0.3 else None),
+        }
+
+    def venue(self, id):
+        name = f'The {self.rng.choice(ADJECTIVES)} {self.rng.choice(NOUNS)} {self.rng.choice(VENUE_KINDS)}'
+        city, state = self.place()
+        return dict({
+            'id': id,
+            'name': name,
+            'city': city,
+            'state': state,
+            'address': f'{self.rng.randint(1, 9999)} {self.rng.choice(STREETS)}',
+            'phone': self.phone(),
+            'genres': self.pick_genres(),
+        }, **self.links(name, 'venue', id))
+
+    def artist(self, id):
+        if self.rng.random() < 0.5:
+            name = f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}'
+        else:
+            name = f'The {self.rng.choice(ADJECTIVES)} {self.rng.choice(NOUNS)}s'
+        city, state = self.place()
+        return dict({
+            'id': id,
+            'name': name,
+            'city': city,
+            'state': state,
+            'phone': self.phone(),
+            'genres': self.pick_genres(),
+        }, **self.links(name, 'artist', id))
+
+    def free(self, booked, day, first, n):
+        # the first of first, first + 1, ... (wrapping) not yet booked on
+        # `day`; popular venues and artists fill up and pass shows on
+        for i in range(n):
+            index = (first + i) % n
+            if (index, day) not in booked:
+                booked.add((index, day))
+                return index
+        return None
+
+    def show(self, id, venues, artists):
+        # two years of history, one year of upcoming shows, evenings only.
+        # At most one show per venue and per artist an evening: shows last
+        # two hours (the default duration) and start by 22:30, so no two
+        # overlap, which the exclusion constraints on shows require.
+        while True:
+            day = self.rng.randrange(1095)
+            venue = self.free(self.venue_days, day, skewed_index(self.rng, venues), venues)
+            if venue is None:
+                continue
+            artist = self.free(self.artist_days, day, skewed_index(self.rng, artists), artists)
+            if artist is not None:
+                break
+            self.venue_days.discard((venue, day))
+        start = (datetime.combine(self.anchor - timedelta(days=730) + timedelta(days=day), time(19))
+                 + timedelta(minutes=30 * self.rng.randrange(8)))
+        return {
+            'show_id': id,
+            'artist_id': artist + 1,
+            'venue_id': venue + 1,
+            'start_time': start.isoformat(),
+        }
+
+
+def write_jsonl(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row))
+            f.write('\n')
+
+
+def generate(out, shows, venues=None, artists=None, seed=1, anchor=None):
+    # returns {'venues': path, 'artists': path, 'shows': path}
+    venues = venues or max(10, shows // 50)
+    artists = artists or max(20, shows // 20)
+    if shows > min(venues, artists) * 1095:
+        raise ValueError('more shows than evenings the venues or artists can play')
+    gen = Generator(seed, anchor or date.today())
+    os.makedirs(out, exist_ok=True)
+
+    paths = {name: os.path.join(out, f'{name}.jsonl')
+             for name in ('venues', 'artists', 'shows')}
+    write_jsonl(paths['venues'], (gen.venue(i) for i in range(1, venues + 1)))
+    write_jsonl(paths['artists'], (gen.artist(i) for i in range(1, artists + 1)))
+    write_jsonl(paths['shows'], (gen.show(i, venues, artists)
+                                 for i in range(1, shows + 1)))
+    return paths
+
+
+def load(paths, batch_size=50000):
+    # imported here so that generating files needs no database
+    from app import create_app, db, page_cache
+    import importer
+
+    app = create_app()
+
+    with app.app_context():
+        for name in ('venues', 'artists', 'shows'):
+            result = importer.load(db.session, name, paths[name],
+                                   batch_size=batch_size, max_errors=0)
+            print(f'{name}: {result.upserted} upserted in {result.seconds:.1f}s '
+                  f'({result.rate:.0f} rows/s)')
+        page_cache.invalidate('venues', 'artists', 'shows')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.generate',
+        description='Write a seeded synthetic catalogue as JSON Lines.')
+    parser.add_argument('--scale', choices=sorted(SCALES, key=SCALES.get), default='10k',
+                        help='number of shows (default: 10k)')
+    parser.add_argument('--shows', type=int, help='exact number of shows, overrides --scale')
+    parser.add_argument('--venues', type=int, help='default: shows / 50')
+    parser.add_argument('--artists', type=int, help='default: shows / 20')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--anchor', type=date.fromisoformat,
+                        help='date splitting past from upcoming shows (default: today)')
+    parser.add_argument('--out', default='bench_data')
+    parser.add_argument('--load', action='store_true',
+                        help='import the files into the configured database')
+    args = parser.parse_args(argv)
+
+    paths = generate(args.out, args.shows or SCALES[args.scale],
+                     venues=args.venues, artists=args.artists,
+                     seed=args.seed, anchor=args.anchor)
+    print('wrote ' + ', '.join(paths.values()))
+    if args.load:
+        load(paths)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#----------------------------------------------------------------------------#
+# Cold-start benchmark.
+#----------------------------------------------------------------------------#
+# Boots the app in --runs fresh interpreters, the way a gunicorn worker (or a
+# test, or a CLI command) does, and reports the boot time and resident memory
+# as JSON, together with the slowest imports from `python -X importtime` and
+# any heavy module the boot loaded although only some requests need it.
+#
+#   python -m benchmarks.importtime --runs 10 --out boot.json
+#
+# No database is needed: building the app does not connect.
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from benchmarks.load import percentile
+
+
+TARGETS = {
+    # what a gunicorn worker runs (wsgi.py)
+    'worker': 'from app import create_app, dispose_engines; '
+              'dispose_engines(create_app())',
+    # importing the modules only
+    'import': 'import app',
+}
+
+# loaded on demand by the views/commands that use them; a boot that pulls
+# them in has regressed
+DEFERRED = ('alembic', 'flask_migrate', 'wtforms', 'flask_wtf', 'babel',
+            'dateutil')
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    'seconds': elapsed,
+    # kilobytes on Linux
+    'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': sorted(sys.modules),
+}}))
+"""
+
+IMPORTTIME = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def probe(code, env):
+    result = subprocess.run([sys.executable, '-c', PROBE.format(code=code)],
+                            capture_output=True, text=True, env=env, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(code, env, top):
+    # top-level (and second-level) imports by cumulative microseconds
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, env=env, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME.match(line)
+        if match and len(match.group(3)) <= 3:
+            rows.append({'module': match.group(4),
+                         'self_ms': int(match.group(1)) / 1000,
+                         'cumulative_ms': int(match.group(2)) / 1000})
+    rows.sort(key=lambda r: r['cumulative_ms'], reverse=True)
+    return rows[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.importtime',
+        description='Measure app boot time and memory in fresh interpreters.')
+    parser.add_argument('--target', choices=sorted(TARGETS), default='worker')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15,
+                        help='slowest imports to list')
+    parser.add_argument('--out', help='write the report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ)
+    code = TARGETS[args.target]
+
+    probe(code, env)  # warm the .pyc files and the OS page cache
+    runs = [probe(code, env) for _ in range(args.runs)]
+    seconds = sorted(r['seconds'] for r in runs)
+    rss_mb = [r['rss_kb'] / 1024 for r in runs]
+    modules = runs[-1]['modules']
+
+    report = {
+        'target': args.target,
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'boot_ms': {
+            'p50': round(statistics.median(seconds) * 1000, 1),
+            'p95': round(percentile(seconds, 95) * 1000, 1),
+            'min': round(seconds[0] * 1000, 1),
+        },
+        'rss_mb': round(statistics.median(rss_mb), 1),
+        'modules_loaded': len(modules),
+        'deferred_modules_loaded': [m for m in DEFERRED if m in modules],
+        'slowest_imports': slowest_imports(code, env, args.top),
+    }
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,398 @@
+#----------------------------------------------------------------------------#
+# Load harness.
+#----------------------------------------------------------------------------#
+# Sends --requests requests to every route of the app, either through the
+# Flask test client (no network, isolates the app) or through a threaded
+# werkzeug server on a local port (adds HTTP parsing and sockets), and writes
+# a JSON baseline:
+#
+#   {"meta": {...}, "routes": {"GET /venues": {"p50_ms": ..., "p95_ms": ...,
+#    "p99_ms": ..., "throughput_rps": ..., "queries_per_request": ...}, ...}}
+#
+# Queries per request come from the /metrics instrumentation (metrics.py).
+# Reads use ids of the existing catalogue (see generate.py); the create,
+# edit and delete routes only touch rows the harness creates itself. Shows
+# are booked one after another past the last existing show, so none is
+# refused as a double booking (see bookings.py), on later runs either.
+#
+#   python -m benchmarks.load --mode wsgi --requests 500 --concurrency 8
+
+import argparse
+import http.client
+import itertools
+import json
+import logging
+import math
+import os
+import platform
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+from choices import STATE_CHOICES, GENRE_CHOICES
+
+
+MARKER = 'Benchmark'
+
+
+def percentile(sorted_values, p):
+    # nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Scenario(object):
+    # `make(rng)` returns (path, form data or None) for one request
+
+    def __init__(self, method, rule, make, share=1.0, limit=None):
+        self.method = method
+        self.rule = rule
+        self.make = make
+        self.share = share
+        self.limit = limit
+
+    def count(self, requests):
+        count = max(1, int(requests * self.share))
+        return count if self.limit is None else min(count, self.limit)
+
+    @property
+    def name(self):
+        return f'{self.method} {self.rule}'
+
+
+#  Clients
+#  ----------------------------------------------------------------
+
+class TestClientTransport(object):
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def __call__(self, method, path, data):
+        if not hasattr(self.local, 'client'):
+            self.local.client = self.app.test_client()
+        response = self.local.client.open(path, method=method, data=data)
+        response.close()
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class WSGITransport(object):
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        # one access log line per request would dominate the timings
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.local = threading.local()
+
+    def __call__(self, method, path, data):
+        if not hasattr(self.local, 'conn'):
+            self.local.conn = http.client.HTTPConnection('127.0.0.1', self.port)
+        conn = self.local.conn
+        body = headers = None
+        if data is not None:
+            body = urlencode(data, doseq=True)
+            headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        response.read()
+        if response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+            conn.close()
+            del self.local.conn
+        return response.status
+
+    def close(self):
+        self.server.shutdown()
+
+
+#  Scenarios
+#  ----------------------------------------------------------------
+
+def catalogue(app, db):
+    # id ranges and a few names of the loaded data
+    from models import Venue, Artist, Shows
+    with app.app_context():
+        def ids(column):
+            low, high = db.session.query(db.func.min(column), db.func.max(column)).one()
+            if low is None:
+                raise SystemExit(f'{column} is empty: run benchmarks.generate --load first')
+            return low, high
+        return {
+            'venues': ids(Venue.id),
+            'artists': ids(Artist.id),
+            'shows': ids(Shows.show_id),
+            # the harness books its shows after this
+            'last_start': db.session.query(db.func.max(Shows.start_time)).scalar(),
+            'words': [name.split()[-1] for name, in
+                      Venue.query.with_entities(Venue.name).limit(50)],
+        }
+
+
+def created(app, model):
+    # ids of the rows this harness created
+    with app.app_context():
+        return [id for id, in model.query.with_entities(model.id)
+                .filter(model.name.like(f'{MARKER} %'))]
+
+
+def scenarios(app, db, data):
+    from models import Venue, Artist
+
+    states = [value for value, label in STATE_CHOICES]
+    genres = [value for value, label in GENRE_CHOICES]
+
+    def venue_id(rng):
+        return rng.randint(*data['venues'])
+
+    def artist_id(rng):
+        return rng.randint(*data['artists'])
+
+    def week(rng):
+        # a week's window somewhere in the catalogue's upcoming year
+        start = datetime.now().date() + timedelta(days=rng.randint(0, 358))
+        return urlencode({'from': start.isoformat(),
+                          'to': (start + timedelta(days=6)).isoformat()})
+
+    def entity_form(rng, venue):
+        form = {
+            'name': f'{MARKER} {rng.randrange(10 ** 9)}',
+            'city': 'San Francisco',
+            'state': rng.choice(states),
+            'phone': '415-000-0000',
+            'genres': rng.sample(genres, 2),
+            'image_link': 'https://picsum.photos/300',
+            'facebook_link': 'https://www.facebook.com/benchmark',
+            'website': 'https://benchmark.example',
+            'seeking_description': '',
+        }
+        if venue:
+            form['address'] = '1 Benchmark Way'
+        return form
+
+    # back-to-back hours, so no two shows overlap whatever venue and artist
+    # they pick
+    first_slot = max(data['last_start'] or datetime.now(), datetime.now()).replace(
+        minute=0, second=0, microsecond=0) + timedelta(days=1)
+    slots = itertools.count()
+
+    def show_form(rng):
+        start = first_slot + timedelta(hours=next(slots))
+        return {'artist_id': artist_id(rng), 'venue_id': venue_id(rng),
+                'start_time': start.strftime('%Y-%m-%d %H:%M:%S'), 'duration': 60}
+
+    since = (datetime.now() - timedelta(days=1)).isoformat(timespec='seconds')
+    reads = [
+        Scenario('GET', '/', lambda rng: ('/', None)),
+        Scenario('GET', '/venues', lambda rng: ('/venues', None)),
+        Scenario('GET', '/venues?genre=', lambda rng: (f'/venues?genre={rng.choice(genres)}', None)),
+        Scenario('POST', '/venues/search', lambda rng: (
+            '/venues/search', {'search_term': rng.choice(data['words'])})),
+        Scenario('GET', '/venues/<int:venue_id>', lambda rng: (f'/venues/{venue_id(rng)}', None)),
+        Scenario('GET', '/venues/create', lambda rng: ('/venues/create', None)),
+        Scenario('GET', '/venues/<int:venue_id>/edit',
+                 lambda rng: (f'/venues/{venue_id(rng)}/edit', None)),
+        Scenario('GET', '/artists', lambda rng: ('/artists', None)),
+        Scenario('GET', '/artists?genre=', lambda rng: (f'/artists?genre={rng.choice(genres)}', None)),
+        Scenario('POST', '/artists/search', lambda rng: (
+            '/artists/search', {'search_term': rng.choice(data['words'])})),
+        Scenario('GET', '/artists/<int:artist_id>', lambda rng: (f'/artists/{artist_id(rng)}', None)),
+        Scenario('GET', '/artists/create', lambda rng: ('/artists/create', None)),
+        Scenario('GET', '/artists/<int:artist_id>/edit',
+                 lambda rng: (f'/artists/{artist_id(rng)}/edit', None)),
+        Scenario('GET', '/shows', lambda rng: ('/shows', None)),
+        Scenario('GET', '/venues/<int:venue_id>/shows.ics',
+                 lambda rng: (f'/venues/{venue_id(rng)}/shows.ics', None)),
+        Scenario('GET', '/artists/<int:artist_id>/shows.ics',
+                 lambda rng: (f'/artists/{artist_id(rng)}/shows.ics', None)),
+        Scenario('GET', '/shows/create', lambda rng: ('/shows/create', None)),
+        Scenario('GET', '/export/<name>.<format>', lambda rng: (
+            f"/export/{rng.choice(['venues', 'artists', 'shows'])}.{rng.choice(['csv', 'jsonl'])}"
+            f'?since={since}', None), share=0.05),
+        Scenario('GET', '/api/v1/venues', lambda rng: ('/api/v1/venues', None)),
+        Scenario('GET', '/api/v1/venues/<int:venue_id>',
+                 lambda rng: (f'/api/v1/venues/{venue_id(rng)}', None)),
+        Scenario('GET', '/api/v1/artists', lambda rng: ('/api/v1/artists?fields=id,name', None)),
+        Scenario('GET', '/api/v1/artists/<int:artist_id>',
+                 lambda rng: (f'/api/v1/artists/{artist_id(rng)}', None)),
+        Scenario('GET', '/api/v1/shows', lambda rng: ('/api/v1/shows', None)),
+        Scenario('GET', '/api/v1/venues/<int:venue_id>/availability', lambda rng: (
+            f'/api/v1/venues/{venue_id(rng)}/availability?{week(rng)}', None)),
+        Scenario('GET', '/api/v1/artists/<int:artist_id>/availability', lambda rng: (
+            f'/api/v1/artists/{artist_id(rng)}/availability?{week(rng)}', None)),
+        Scenario('GET', '/stats/pool', lambda rng: ('/stats/pool', None)),
+        Scenario('GET', '/stats/formatting', lambda rng: ('/stats/formatting', None)),
+        Scenario('GET', '/stats/compression', lambda rng: ('/stats/compression', None)),
+        Scenario('GET', '/metrics', lambda rng: ('/metrics', None)),
+    ]
+    creates = [
+        Scenario('POST', '/venues/create', lambda rng: ('/venues/create', entity_form(rng, True)),
+                 share=0.1),
+        Scenario('POST', '/artists/create', lambda rng: ('/artists/create', entity_form(rng, False)),
+                 share=0.1),
+        Scenario('POST', '/shows/create', lambda rng: ('/shows/create', show_form(rng)), share=0.1),
+    ]
+
+    def writes():
+        # built after the creates ran, from the rows they made
+        venues, artists = created(app, Venue), created(app, Artist)
+        remaining = list(venues)
+
+        def delete(rng):
+            return f'/venues/{remaining.pop()}', None
+
+        return [
+            Scenario('POST', '/venues/<int:venue_id>/edit', lambda rng: (
+                f'/venues/{rng.choice(venues)}/edit', entity_form(rng, True)), share=0.1),
+            Scenario('POST', '/artists/<int:artist_id>/edit', lambda rng: (
+                f'/artists/{rng.choice(artists)}/edit', entity_form(rng, False)), share=0.1),
+            Scenario('DELETE', '/venues/<venue_id>', delete, share=0.1,
+                     limit=len(venues)),
+        ]
+
+    return reads, creates, writes
+
+
+#  Running
+#  ----------------------------------------------------------------
+
+def query_totals(metrics):
+    # {(endpoint, method): (queries, requests)} so far
+    with metrics._lock:
+        return {k: (v['queries'], sum(metrics.latency[k].counts))
+                for k, v in metrics.totals.items()}
+
+
+def run(transport, metrics, scenario, count, concurrency, seed):
+    rng = random.Random(f'{seed}:{scenario.name}')
+    requests = [scenario.make(rng) for _ in range(count)]
+    before = query_totals(metrics)
+
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(request):
+        nonlocal errors
+        path, data = request
+        started = time.perf_counter()
+        status = transport(scenario.method, path, data)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, requests))
+    wall = time.perf_counter() - started
+
+    queries = handled = 0
+    for key, (q, c) in query_totals(metrics).items():
+        q0, c0 = before.get(key, (0, 0))
+        queries += q - q0
+        handled += c - c0
+
+    latencies.sort()
+
+    def ms(seconds):
+        return round(seconds * 1000, 3)
+
+    return {
+        'requests': count,
+        'errors': errors,
+        'mean_ms': ms(sum(latencies) / len(latencies)),
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'throughput_rps': round(count / wall, 2),
+        'queries_per_request': round(queries / handled, 2) if handled else 0,
+    }
+
+
+def uncovered(app, names):
+    # app routes without a scenario, so new routes don't go unmeasured
+    rules = {f'{method} {rule.rule}' for rule in app.url_map.iter_rules()
+             # files, not app code: the source files and the asset bundles
+             if rule.endpoint not in ('static', 'assets')
+             for method in rule.methods - {'HEAD', 'OPTIONS'}}
+    covered = {name.split('?')[0] for name in names}
+    return sorted(rules - covered)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.load',
+        description='Measure every route and write a JSON baseline.')
+    parser.add_argument('--mode', choices=['test-client', 'wsgi'], default='test-client')
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-page-cache', action='store_true',
+                        help='measure the views rather than the page cache')
+    parser.add_argument('--out', help='write the baseline here instead of stdout')
+    args = parser.parse_args(argv)
+
+    if args.no_page_cache:
+        os.environ['FYYUR_PAGE_CACHE_BACKEND'] = 'null'
+    # the budget warning would drown the output; the counts are in the report
+    os.environ.setdefault('FYYUR_QUERY_BUDGET', '0')
+    from app import create_app, db, metrics
+    app = create_app()
+
+    data = catalogue(app, db)
+    if args.mode == 'wsgi':
+        transport = WSGITransport(app)
+    else:
+        transport = TestClientTransport(app)
+
+    reads, creates, writes = scenarios(app, db, data)
+    results = {}
+    try:
+        for group in (reads, creates, None):
+            for scenario in group if group is not None else writes():
+                results[scenario.name] = run(transport, metrics, scenario,
+                                             scenario.count(args.requests),
+                                             args.concurrency, args.seed)
+                print(f"{scenario.name:40} p50 {results[scenario.name]['p50_ms']:>9} ms  "
+                      f"p99 {results[scenario.name]['p99_ms']:>9} ms  "
+                      f"{results[scenario.name]['queries_per_request']:>6} q/req",
+                      flush=True)
+    finally:
+        transport.close()
+
+    report = {
+        'meta': {
+            'mode': args.mode,
+            'requests_per_route': args.requests,
+            'concurrency': args.concurrency,
+            'seed': args.seed,
+            'page_cache': not args.no_page_cache,
+            'catalogue': {k: v for k, v in data.items() if k not in ('words', 'last_start')},
+            'python': platform.python_version(),
+            'started': datetime.now().isoformat(timespec='seconds'),
+            'uncovered_routes': uncovered(app, results),
+        },
+        'routes': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+#----------------------------------------------------------------------------#
+# Bookings.
+#----------------------------------------------------------------------------#
+# A show occupies its venue and its artist for [start_time, start_time +
+# duration), stored as the generated tsrange column shows.slot, which is NULL
+# for a show without a start_time. Two GiST exclusion constraints (migration
+# f3a9c6e2b071) reject a show whose slot overlaps another at the same venue
+# or with the same artist, so double bookings are refused by postgres however
+# the show is written. The same indexes answer availability: `venue_id = ?
+# AND slot && ?` is one index probe, not a scan of the venue's shows.
+
+from sqlalchemy import func
+
+
+# SQLSTATE exclusion_violation
+EXCLUSION_VIOLATION = '23P01'
+
+# constraint -> what is double-booked
+CONSTRAINTS = {
+    'shows_venue_id_slot_excl': 'venue',
+    'shows_artist_id_slot_excl': 'artist',
+}
+
+
+def double_booked(error):
+    # 'venue' or 'artist' if `error` (an IntegrityError) is a refused double
+    # booking, otherwise None
+    orig = getattr(error, 'orig', None)
+    if getattr(orig, 'pgcode', None) != EXCLUSION_VIOLATION:
+        return None
+    return CONSTRAINTS.get(orig.diag.constraint_name)
+
+
+def conflicts(shows, fk, owner_id, start, end):
+    # the shows of one venue or artist overlapping [start, end); shows
+    # without a start_time occupy nothing
+    return shows.query.with_entities(
+        shows.show_id, shows.start_time, shows.duration).filter(
+        fk == owner_id).filter(shows.start_time.isnot(None)).filter(
+        shows.slot.overlaps(func.tsrange(start, end))).order_by(
+        shows.start_time).all()
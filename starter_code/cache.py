@@ -0,0 +1,222 @@
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+# Rendered GET pages are cached per group ("venues", "venue:3", ...) and query
+# string. Each group has a version token stored next to the pages; the write
+# handlers bump the tokens of the groups they touch, which orphans exactly
+# those pages. Orphans and time-sensitive pages (upcoming shows turning into
+# past shows) fall out through their expiry.
+#
+# Backends:
+#   lru         in-process, per worker. Another worker's invalidation is not
+#               seen, so staleness there is bounded by PAGE_CACHE_TTL.
+#   filesystem  shared by every worker on the host via PAGE_CACHE_DIR.
+#   null        caching disabled.
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+
+from flask import g, request, session
+
+from routing import pinned
+
+
+class NullBackend(object):
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LRUBackend(object):
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires is not None and expires < time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._items[key] = (expires, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class FileSystemBackend(object):
+
+    # expired and orphaned files are swept every `prune_every` writes
+    prune_every = 256
+
+    def __init__(self, path):
+        self.path = path
+        self._writes = 0
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._file(key), 'rb') as f:
+                expires, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires is not None and expires < time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + ttl if ttl is not None else None
+        # write then rename, so readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.path)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((expires, value), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._file(key))
+
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune()
+
+    def prune(self):
+        now = time.time()
+        for name in os.listdir(self.path):
+            file = os.path.join(self.path, name)
+            try:
+                with open(file, 'rb') as f:
+                    expires, _ = pickle.load(f)
+                if expires is not None and expires < now:
+                    os.remove(file)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+
+    def delete(self, key):
+        try:
+            os.remove(self._file(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.path):
+            try:
+                os.remove(os.path.join(self.path, name))
+            except OSError:
+                pass
+
+
+def make_backend(config):
+    name = config.get('PAGE_CACHE_BACKEND', 'lru')
+    if name == 'lru':
+        return LRUBackend(config.get('PAGE_CACHE_SIZE', 1024))
+    if name == 'filesystem':
+        return FileSystemBackend(config['PAGE_CACHE_DIR'])
+    if name == 'null':
+        return NullBackend()
+    raise ValueError(f'unknown PAGE_CACHE_BACKEND {name!r}')
+
+
+class PageCache(object):
+
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        self.ttl = 60
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.backend = make_backend(app.config)
+        self.ttl = app.config.get('PAGE_CACHE_TTL', 60)
+        app.extensions['page_cache'] = self
+
+    def _version(self, group):
+        version = self.backend.get(f'version:{group}')
+        if version is None:
+            # first use, or the token was evicted: start a fresh generation
+            # rather than risk reviving pages of an older one
+            version = self.invalidate(group)
+        return version
+
+    def _page_key(self, group):
+        return (f'page:{group}:{self._version(group)}:'
+                f'{request.query_string.decode()}')
+
+    def invalidate(self, *groups):
+        version = uuid.uuid4().hex
+        for group in groups:
+            self.backend.set(f'version:{group}', version)
+        return version
+
+    def expire_at(self, when):
+        # lets a view cut its page's lifetime short, e.g. at the start of its
+        # next upcoming show
+        if when is not None and (g.get('page_cache_expires') is None
+                                 or when < g.page_cache_expires):
+            g.page_cache_expires = when
+
+    def _page_ttl(self):
+        expires = g.pop('page_cache_expires', None)
+        if expires is None:
+            return self.ttl
+        return max(0, min(self.ttl, (expires - datetime.now()).total_seconds()))
+
+    def cached(self, group):
+        # `group` is formatted with the view arguments, e.g. 'venue:{venue_id}'
+        def decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                # pages carrying flashed messages are per-client, and clients
+                # that just wrote must see their change (see routing.py)
+                if '_flashes' in session or pinned():
+                    return f(*args, **kwargs)
+
+                key = self._page_key(group.format(**kwargs))
+                page = self.backend.get(key)
+                if page is not None:
+                    return page
+
+                page = f(*args, **kwargs)
+                if isinstance(page, str):
+                    ttl = self._page_ttl()
+                    if ttl > 0:
+                        self.backend.set(key, page, ttl)
+                return page
+            return wrapper
+        return decorator
@@ -0,0 +1,110 @@
+#----------------------------------------------------------------------------#
+# Choices.
+#----------------------------------------------------------------------------#
+# The state and genre vocabularies: one in-memory copy per process, shared by
+# the form choices, the importer's validation and the model columns, which
+# store the integer ids (venues.state_id, venues.genre_ids, ...). The ids are
+# also the primary keys of the states and genres tables, so never renumber or
+# reuse one: append new entries, with a migration inserting the new rows.
+# Kept apart from forms.py so that users don't load WTForms.
+
+
+class Vocabulary(object):
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.ids = {name: id for id, name in entries}
+        self.names = dict(entries)
+        self.choices = [(name, name) for id, name in entries]
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def id(self, name):
+        try:
+            return self.ids[name]
+        except KeyError:
+            raise ValueError(f'unknown value {name!r}')
+
+    def name(self, id):
+        return self.names[id]
+
+
+STATES = Vocabulary([
+    (1, 'AL'),
+    (2, 'AK'),
+    (3, 'AZ'),
+    (4, 'AR'),
+    (5, 'CA'),
+    (6, 'CO'),
+    (7, 'CT'),
+    (8, 'DE'),
+    (9, 'DC'),
+    (10, 'FL'),
+    (11, 'GA'),
+    (12, 'HI'),
+    (13, 'ID'),
+    (14, 'IL'),
+    (15, 'IN'),
+    (16, 'IA'),
+    (17, 'KS'),
+    (18, 'KY'),
+    (19, 'LA'),
+    (20, 'ME'),
+    (21, 'MT'),
+    (22, 'NE'),
+    (23, 'NV'),
+    (24, 'NH'),
+    (25, 'NJ'),
+    (26, 'NM'),
+    (27, 'NY'),
+    (28, 'NC'),
+    (29, 'ND'),
+    (30, 'OH'),
+    (31, 'OK'),
+    (32, 'OR'),
+    (33, 'MD'),
+    (34, 'MA'),
+    (35, 'MI'),
+    (36, 'MN'),
+    (37, 'MS'),
+    (38, 'MO'),
+    (39, 'PA'),
+    (40, 'RI'),
+    (41, 'SC'),
+    (42, 'SD'),
+    (43, 'TN'),
+    (44, 'TX'),
+    (45, 'UT'),
+    (46, 'VT'),
+    (47, 'VA'),
+    (48, 'WA'),
+    (49, 'WV'),
+    (50, 'WI'),
+    (51, 'WY'),
+])
+
+GENRES = Vocabulary([
+    (1, 'Alternative'),
+    (2, 'Blues'),
+    (3, 'Classical'),
+    (4, 'Country'),
+    (5, 'Electronic'),
+    (6, 'Folk'),
+    (7, 'Funk'),
+    (8, 'Hip-Hop'),
+    (9, 'Heavy Metal'),
+    (10, 'Instrumental'),
+    (11, 'Jazz'),
+    (12, 'Musical Theatre'),
+    (13, 'Pop'),
+    (14, 'Punk'),
+    (15, 'R&B'),
+    (16, 'Reggae'),
+    (17, 'Rock n Roll'),
+    (18, 'Soul'),
+    (19, 'Other'),
+])
+
+STATE_CHOICES = STATES.choices
+GENRE_CHOICES = GENRES.choices
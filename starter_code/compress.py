@@ -0,0 +1,153 @@
+#----------------------------------------------------------------------------#
+# Response compression.
+#----------------------------------------------------------------------------#
+# Compresses text responses (HTML, JSON, CSS, JS, ...) with brotli or gzip,
+# whichever the client's Accept-Encoding prefers, brotli winning a tie.
+# Skipped: bodies under COMPRESS_MIN_SIZE, responses that already carry a
+# Content-Encoding (the precompressed bundles of assets.py), and streamed
+# responses (exports, .ics feeds), whose body is not known up front.
+#
+# Compressing a large venue page costs milliseconds, and under load most
+# requests get a page the page cache already rendered. So compressed bodies
+# of cacheable responses are kept in a per-worker LRU, bounded to
+# COMPRESS_CACHE_BYTES and keyed by a hash of the body and the encoding; an
+# identical page is compressed once, and an invalidated page simply stops
+# being asked for and ages out.
+#
+# Brotli comes from the `Brotli` package in requirements.txt; where it is not
+# installed only gzip is offered.
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE = {
+    'text/html', 'text/css', 'text/plain', 'text/xml', 'text/javascript',
+    'text/calendar', 'application/json', 'application/javascript',
+    'application/xml', 'application/x-ndjson', 'image/svg+xml',
+}
+
+
+class BodyCache(object):
+    # LRU bounded by the total size of the stored bodies
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._items.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._items.move_to_end(key)
+            return body
+
+    def set(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "entries": len(self._items), "bytes": self.size,
+                    "max_bytes": self.max_bytes}
+
+
+class Compression(object):
+
+    def __init__(self, app=None):
+        self.cache = BodyCache(0)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', 500)
+        self.gzip_level = app.config.get('COMPRESS_GZIP_LEVEL', 6)
+        self.brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 5)
+        self.cache = BodyCache(app.config.get('COMPRESS_CACHE_BYTES', 16 * 1024 * 1024))
+        app.after_request(self._after)
+        app.extensions['compression'] = self
+
+    def encodings(self):
+        return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def negotiate(self):
+        # the accepted encoding with the highest q, or None
+        best, best_q = None, 0
+        for encoding in self.encodings():
+            q = request.accept_encodings[encoding]
+            if q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    def compress(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        # mtime=0: identical bodies give identical bytes
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def _cacheable(self, response):
+        return (request.method in ('GET', 'HEAD') and response.status_code == 200
+                and not response.cache_control.no_store
+                and not response.cache_control.private)
+
+    def _after(self, response):
+        if (response.mimetype not in COMPRESSIBLE or response.direct_passthrough
+                or response.is_streamed or 'Content-Encoding' in response.headers):
+            return response
+        # whether compressed or not, the body depends on Accept-Encoding
+        response.vary.add('Accept-Encoding')
+        if not 200 <= response.status_code < 300 or response.status_code == 204:
+            return response
+
+        body = response.get_data()
+        encoding = self.negotiate()
+        if encoding is None or len(body) < self.min_size:
+            return response
+
+        if self._cacheable(response):
+            key = (encoding, hashlib.sha1(body).digest())
+            compressed = self.cache.get(key)
+            if compressed is None:
+                compressed = self.compress(body, encoding)
+                self.cache.set(key, compressed)
+        else:
+            compressed = self.compress(body, encoding)
+        if len(compressed) >= len(body):
+            return response
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            # the compressed body is a different representation
+            response.set_etag(f'{etag}-{encoding}', weak)
+        return response
+
+    def stats(self):
+        return dict(self.cache.stats(), encodings=list(self.encodings()))
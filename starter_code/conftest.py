@@ -0,0 +1,2 @@
+# lets the tests under tests/ import the app's top-level modules
+# (pagination, facets, ...) when pytest runs from this directory
@@ -0,0 +1,72 @@
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+# venues and artists carry upcoming_shows_count and past_shows_count, so the
+# listing and search pages read a column instead of counting shows. Writes
+# to shows keep them in step through triggers (migration c8e4a1d6f035);
+# what the triggers cannot see is time passing. A show counts as upcoming
+# while it starts after show_counts_rollover.rolled_at, and rollover() moves
+# that watermark up to now, shifting the shows it passes from upcoming to
+# past. Run it from cron, e.g. every minute:
+#
+#   * * * * *  cd /srv/fyyur && FLASK_APP=app flask shows rollover
+#
+# Between runs the counters lag by at most the schedule's interval.
+
+from datetime import datetime
+from sqlalchemy import func, update
+
+
+def watermark(session, table, lock=False):
+    query = session.query(table.c.rolled_at)
+    if lock:
+        # writes to shows take FOR SHARE on this row (see the triggers), so
+        # once it is held every show the batch counts is committed. It is
+        # taken before any venue or artist row; writers that lock those
+        # first take FOR SHARE up front (importer.LOCK_WATERMARK).
+        query = query.with_for_update()
+    return query.scalar()
+
+
+def _move(session, model, fk, shows, lo, hi):
+    # shows starting in (lo, hi] are now past; returns the ids that changed
+    moved = session.query(fk.label('id'), func.count().label('n')).filter(
+        shows.start_time > lo).filter(
+        shows.start_time <= hi).group_by(fk).subquery()
+    stmt = update(model.__table__).values(
+        upcoming_shows_count=model.upcoming_shows_count - moved.c.n,
+        past_shows_count=model.past_shows_count + moved.c.n).where(
+        model.id == moved.c.id).returning(model.id)
+    return [r[0] for r in session.execute(stmt)]
+
+
+def rollover(session, table, shows, venue_model, artist_model,
+             batch_size=10000, now=None, progress=None):
+    # advances the watermark to `now` in batches of about `batch_size` shows,
+    # committing each, so a long backlog (say, after downtime) never holds
+    # the lock for long and an interrupted run loses nothing. Returns the
+    # (venue ids, artist ids) whose counters changed.
+    now = now or datetime.now()
+    venue_ids, artist_ids = set(), set()
+    while True:
+        lo = watermark(session, table, lock=True)
+        if lo >= now:
+            session.rollback()
+            break
+        # the batch ends at the batch_size-th show to pass, and takes in any
+        # show starting at the same time
+        hi = session.query(shows.start_time).filter(
+            shows.start_time > lo).filter(
+            shows.start_time <= now).order_by(shows.start_time).offset(
+            batch_size - 1).limit(1).scalar() or now
+
+        venues = _move(session, venue_model, shows.venue_id, shows, lo, hi)
+        artists = _move(session, artist_model, shows.artist_id, shows, lo, hi)
+        session.execute(table.update().values(rolled_at=hi))
+        session.commit()
+
+        venue_ids.update(venues)
+        artist_ids.update(artists)
+        if progress is not None:
+            progress(hi, len(venues), len(artists))
+    return venue_ids, artist_ids
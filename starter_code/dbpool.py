@@ -0,0 +1,78 @@
+#----------------------------------------------------------------------------#
+# Connection pool.
+#----------------------------------------------------------------------------#
+# Engine options come from config.py (pool size, overflow, recycle,
+# pre-ping, timeout; all overridable from the environment). This module adds
+# a QueuePool that records how long checkouts wait, and the compiled
+# statement cache, and reports both for /stats/pool.
+#
+# Size workers so that workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays below
+# postgres' max_connections, leaving room for migrations and psql.
+
+import threading
+import time
+
+import sqlalchemy
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.util import LRUCache
+
+
+class TimedQueuePool(QueuePool):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wait_lock = threading.Lock()
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            with self._wait_lock:
+                self.waits += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+
+def _sqlalchemy_14():
+    return tuple(int(p) for p in sqlalchemy.__version__.split('.')[:2]) >= (1, 4)
+
+
+def init_app(app):
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options.setdefault('poolclass', TimedQueuePool)
+
+    # psycopg2 has no server-side prepared statements, so the cache that can
+    # be sized is SQLAlchemy's compiled-statement cache
+    cache_size = app.config.get('DB_STATEMENT_CACHE_SIZE')
+    if cache_size is not None:
+        if _sqlalchemy_14():
+            options.setdefault('query_cache_size', cache_size)
+        else:
+            execution_options = dict(options.get('execution_options') or {})
+            execution_options.setdefault('compiled_cache', LRUCache(cache_size))
+            options['execution_options'] = execution_options
+
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def stats(engine):
+    pool = engine.pool
+    data = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "timeout": pool.timeout(),
+    }
+    if isinstance(pool, TimedQueuePool):
+        data.update({
+            "waits": pool.waits,
+            "wait_seconds_total": round(pool.wait_seconds, 6),
+            "wait_seconds_max": round(pool.max_wait_seconds, 6),
+        })
+    return data
@@ -0,0 +1,92 @@
+#----------------------------------------------------------------------------#
+# Denormalized show columns.
+#----------------------------------------------------------------------------#
+# `shows` carries copies of the artist's and venue's name and image so the
+# listing pages can render without joins. The copies are kept in step with
+# set-based UPDATEs: one statement per edit, and a chunked repair pass over
+# the whole table for drift from older writes.
+
+from sqlalchemy import or_, update
+
+
+# shows column -> source column
+ARTIST_COLUMNS = {'artist_name': 'name', 'artist_image_link': 'image_link'}
+VENUE_COLUMNS = {'venue_name': 'name', 'venue_image_link': 'image_link'}
+
+
+def _copy(shows, source, columns):
+    # `source` is an instance (literal values) or a model class (columns)
+    values = {c: getattr(source, s) for c, s in columns.items()}
+    drifted = or_(*[getattr(shows, c).is_distinct_from(v)
+                    for c, v in values.items()])
+    return values, drifted
+
+
+def propagate(session, shows, fk, source, columns, returning):
+    # refresh the copies of one edited artist/venue; returns the `returning`
+    # column of every show that changed (e.g. the venue ids of an artist's
+    # shows) so callers can invalidate the pages rendering them
+    values, drifted = _copy(shows, source, columns)
+    stmt = update(shows.__table__).values(**values).where(
+        fk == source.id).where(drifted).returning(returning)
+    return [r[0] for r in session.execute(stmt)]
+
+
+def propagate_artist(session, shows, artist):
+    return propagate(session, shows, shows.artist_id, artist,
+                     ARTIST_COLUMNS, shows.venue_id)
+
+
+def propagate_venue(session, shows, venue):
+    return propagate(session, shows, shows.venue_id, venue,
+                     VENUE_COLUMNS, shows.artist_id)
+
+
+def fill_show(session, show, artist_model, venue_model):
+    # a new show takes its copies from the source rows, not from the form
+    row = session.query(artist_model, venue_model).filter(
+        artist_model.id == show.artist_id,
+        venue_model.id == show.venue_id).first()
+    if row is None:
+        return
+    artist, venue = row
+    for c, s in ARTIST_COLUMNS.items():
+        setattr(show, c, getattr(artist, s))
+    for c, s in VENUE_COLUMNS.items():
+        setattr(show, c, getattr(venue, s))
+
+
+def _repair_range(session, shows, fk, source_model, columns, lo, hi):
+    # with the model class as source this becomes UPDATE ... FROM <source>
+    values, drifted = _copy(shows, source_model, columns)
+    stmt = update(shows.__table__).values(**values).where(
+        fk == source_model.id).where(
+        shows.show_id > lo).where(shows.show_id <= hi).where(drifted).returning(
+        shows.artist_id, shows.venue_id)
+    return session.execute(stmt).fetchall()
+
+
+def repair(session, shows, artist_model, venue_model, batch_size=10000,
+           start_after=0, progress=None):
+    # walks shows in show_id ranges of `batch_size`, committing each range,
+    # so an interrupted run can resume from the last reported show_id.
+    # Returns the (artist_id, venue_id) pairs of the repaired shows.
+    last = session.query(shows.show_id).order_by(
+        shows.show_id.desc()).limit(1).scalar()
+    if last is None:
+        return []
+
+    repaired = []
+    lo = start_after
+    while lo < last:
+        hi = lo + batch_size
+        fixed = _repair_range(session, shows, shows.artist_id, artist_model,
+                              ARTIST_COLUMNS, lo, hi)
+        fixed += _repair_range(session, shows, shows.venue_id, venue_model,
+                               VENUE_COLUMNS, lo, hi)
+        session.commit()
+        repaired.extend(fixed)
+        if progress is not None:
+            progress(min(hi, last), len(fixed))
+        lo = hi
+    return repaired
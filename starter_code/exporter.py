@@ -0,0 +1,103 @@
+#----------------------------------------------------------------------------#
+# Streaming export.
+#----------------------------------------------------------------------------#
+# Writes venues, artists or shows as CSV or JSON Lines one row at a time.
+# Rows are read through a server-side cursor (yield_per), so memory use does
+# not depend on the size of the table. CSV output uses the same layout the
+# importer reads (genres joined with ';', durations in whole minutes), so an
+# export can be imported again as it is.
+#
+# updated_at is set to now(), the start of the writing transaction, and a
+# row only becomes visible when that transaction commits, possibly much
+# later. (clock_timestamp() would not help: the row is still stamped before
+# its commit.) So an incremental export reads from `since` minus an overlap
+# (EXPORT_SINCE_OVERLAP_SECONDS) and rows near the boundary are sent twice;
+# consumers upsert by key, as the importer does.
+
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from payloads import minutes
+
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+COLUMNS = {
+    'venues': ['id', 'name', 'city', 'state', 'address', 'phone', 'genres',
+               'image_link', 'facebook_link', 'website', 'seeking_description',
+               'updated_at'],
+    'artists': ['id', 'name', 'city', 'state', 'phone', 'genres', 'image_link',
+                'facebook_link', 'website', 'seeking_description', 'updated_at'],
+    'shows': ['show_id', 'artist_id', 'venue_id', 'start_time', 'duration',
+              'artist_name', 'artist_image_link', 'venue_name', 'venue_image_link',
+              'updated_at'],
+}
+
+
+def parse_since(value):
+    if not value:
+        return None
+    return datetime.fromisoformat(value)
+
+
+def export_query(model, columns, since=None, batch_size=1000, overlap=timedelta(0)):
+    query = model.query.with_entities(*[getattr(model, c) for c in columns])
+    if since is not None:
+        query = query.filter(model.updated_at >= since - overlap)
+    key = model.__mapper__.primary_key[0]
+    # stream_results asks psycopg2 for a named (server-side) cursor
+    return query.order_by(key).execution_options(
+        stream_results=True).yield_per(batch_size)
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return ';'.join(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return minutes(value)
+    return value
+
+
+def csv_lines(rows, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        out = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return out
+
+    yield line(columns)
+    for row in rows:
+        yield line([_csv_value(v) for v in row])
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return minutes(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def jsonl_lines(rows, columns):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), default=_json_default) + '\n'
+
+
+def export_lines(model, name, format, since=None, batch_size=1000,
+                 overlap=timedelta(0)):
+    columns = COLUMNS[name]
+    rows = export_query(model, columns, since, batch_size, overlap)
+    if format == 'csv':
+        return csv_lines(rows, columns)
+    return jsonl_lines(rows, columns)
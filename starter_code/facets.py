@@ -0,0 +1,104 @@
+#----------------------------------------------------------------------------#
+# Facets.
+#----------------------------------------------------------------------------#
+# genre / state / city filters for the /venues and /artists listings, plus
+# the counts shown next to each facet value. Genres filter with array
+# containment on the genre ids (genre_ids @> ARRAY[...]), which the GIN index
+# on that column serves; all facet counts come from one GROUPING SETS query.
+
+from flask import request, url_for
+from sqlalchemy import SmallInteger, cast, false, func, null, tuple_
+from sqlalchemy.dialects import postgresql
+
+from choices import STATES, GENRES
+
+
+FACETS = ('genre', 'state', 'city')
+
+# GROUPING(genre, state, city) is a bitmask of the columns *not* grouped
+GROUPING_BITS = {3: 'genre', 5: 'state', 6: 'city'}
+
+
+def selected():
+    # the facet filters of the current request
+    return {
+        'genre': request.args.getlist('genre'),
+        'state': request.args.get('state') or None,
+        'city': request.args.get('city') or None,
+    }
+
+
+def genres_contain(column, genres):
+    # the cast keeps both sides smallint[] so the GIN index applies
+    ids = [GENRES.id(g) for g in genres]
+    return column.op('@>')(cast(postgresql.array(ids), postgresql.ARRAY(SmallInteger)))
+
+
+def apply(query, model, chosen):
+    # a value outside the vocabulary (a hand-edited URL) matches nothing
+    if chosen['genre']:
+        query = query.filter(genres_contain(model.genres, chosen['genre'])
+                             if all(g in GENRES for g in chosen['genre']) else false())
+    if chosen['state']:
+        query = query.filter(model.state == chosen['state']
+                             if chosen['state'] in STATES else false())
+    if chosen['city']:
+        query = query.filter(model.city == chosen['city'])
+    return query
+
+
+def counts(session, model, chosen, limit=20):
+    # one row per (facet, value) over the filtered set. Appending NULL to the
+    # genres keeps entities without genres in the state and city counts.
+    base = apply(session.query(
+        model.id,
+        model.state,
+        model.city,
+        func.unnest(func.array_append(model.genres, null())).label('genre')
+    ), model, chosen).subquery()
+
+    rows = session.query(
+        func.grouping(base.c.genre, base.c.state, base.c.city).label('grouping'),
+        base.c.genre,
+        base.c.state,
+        base.c.city,
+        func.count(base.c.id.distinct()).label('count')
+    ).group_by(func.grouping_sets(
+        tuple_(base.c.genre), tuple_(base.c.state), tuple_(base.c.city)
+    )).all()
+    return tally(rows, limit)
+
+
+def tally(rows, limit=20):
+    # {facet: [(value, count), ...]}, most frequent first, from the rows of
+    # the GROUPING SETS query
+    data = {f: [] for f in FACETS}
+    for row in rows:
+        facet = GROUPING_BITS.get(row.grouping)
+        value = getattr(row, facet) if facet else None
+        if value is not None:
+            if facet == 'genre':
+                # unnest() returns the raw ids
+                value = GENRES.name(value)
+            data[facet].append((value, row.count))
+
+    for facet in FACETS:
+        data[facet] = sorted(data[facet], key=lambda v: (-v[1], v[0]))[:limit]
+    return data
+
+
+def facet_url(facet, value):
+    # the current listing with `value` toggled for `facet`; starts over at
+    # the first page since the result set changes
+    args = request.args.to_dict(flat=False)
+    args.pop('after', None)
+    args.pop('before', None)
+    if facet == 'genre':
+        genres = args.get('genre', [])
+        args['genre'] = ([g for g in genres if g != value] if value in genres
+                         else genres + [value])
+    elif args.get(facet) == [value]:
+        args.pop(facet)
+    else:
+        args[facet] = [value]
+    return url_for(request.endpoint, **args)
@@ -0,0 +1,87 @@
+#----------------------------------------------------------------------------#
+# Datetime formatting.
+#----------------------------------------------------------------------------#
+# Backs the `datetime` Jinja filter. Babel patterns are compiled once per
+# (format, locale) and formatted strings are kept in a bounded LRU, so a page
+# listing hundreds of shows only pays for the timestamps it has not seen yet.
+# Babel (and dateutil, for legacy string values) is imported on first use, so
+# processes that never render a date don't load it.
+
+from datetime import datetime
+from functools import lru_cache
+
+
+# named formats used by the templates; anything else is a Babel pattern
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+def resolve_pattern(format, locale):
+    if format in FORMATS:
+        return FORMATS[format]
+    if format in ('short', 'long'):
+        from babel.dates import get_datetime_format, get_date_format, get_time_format
+        # same composition babel.dates.format_datetime uses for named formats
+        return get_datetime_format(format, locale).replace("'", "") \
+            .replace('{0}', get_time_format(format, locale).pattern) \
+            .replace('{1}', get_date_format(format, locale).pattern)
+    return format
+
+
+class DateTimeFormatter(object):
+
+    def __init__(self, app=None):
+        # None: babel's LC_TIME, looked up on the first format()
+        self.locale = None
+        self._compile = lru_cache(maxsize=None)(self._compile_pattern)
+        self._format = lru_cache(maxsize=4096)(self._format_value)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.locale = app.config.get('DATETIME_LOCALE')
+        self._format = lru_cache(
+            maxsize=app.config.get('DATETIME_FORMAT_CACHE_SIZE', 4096)
+        )(self._format_value)
+        app.extensions['datetime_formatter'] = self
+        app.jinja_env.filters['datetime'] = self.format
+
+    def _compile_pattern(self, format, locale):
+        from babel import Locale
+        from babel.dates import parse_pattern
+        locale = Locale.parse(locale)
+        return parse_pattern(resolve_pattern(format, locale)), locale
+
+    def _format_value(self, value, format, locale):
+        pattern, locale = self._compile(format, locale)
+        return pattern.apply(value, locale)
+
+    def format(self, value, format='medium', locale=None):
+        if value is None:
+            return ''
+        if not isinstance(value, datetime):
+            # legacy string input; templates should pass datetimes
+            import dateutil.parser
+            value = dateutil.parser.parse(value)
+        if self.locale is None:
+            from babel.dates import LC_TIME
+            self.locale = LC_TIME
+        return self._format(value, format, locale or self.locale)
+
+    __call__ = format
+
+    def stats(self):
+        patterns = self._compile.cache_info()
+        values = self._format.cache_info()
+        return {
+            "pattern_cache": {"hits": patterns.hits, "misses": patterns.misses,
+                              "size": patterns.currsize},
+            "value_cache": {"hits": values.hits, "misses": values.misses,
+                            "size": values.currsize, "maxsize": values.maxsize},
+        }
+
+    def clear(self):
+        self._compile.cache_clear()
+        self._format.cache_clear()
@@ -0,0 +1,30 @@
+# gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Every setting can be overridden from the environment. Size the pools so
+# that workers * (FYYUR_DB_POOL_SIZE + FYYUR_DB_MAX_OVERFLOW) stays below
+# postgres' max_connections.
+
+import multiprocessing
+import os
+
+bind = os.environ.get('FYYUR_BIND', '0.0.0.0:' + os.environ.get('PORT', '8000'))
+# one worker per core, plus one to cover a worker blocked on I/O
+workers = int(os.environ.get('FYYUR_WORKERS', multiprocessing.cpu_count() + 1))
+threads = int(os.environ.get('FYYUR_THREADS', 2))
+timeout = int(os.environ.get('FYYUR_WORKER_TIMEOUT', 30))
+# recycle workers now and then so slow leaks can't accumulate
+max_requests = int(os.environ.get('FYYUR_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+# build the app once in the master; workers share its imported code
+preload_app = True
+raw_env = ['FYYUR_DEBUG=' + os.environ.get('FYYUR_DEBUG', '0')]
+
+accesslog = '-'
+
+
+def post_fork(server, worker):
+    # connections must never be shared with the master or a sibling
+    from wsgi import app
+    from app import dispose_engines
+    dispose_engines(app)
@@ -0,0 +1,81 @@
+#----------------------------------------------------------------------------#
+# iCalendar feeds.
+#----------------------------------------------------------------------------#
+# Per-venue and per-artist show calendars (RFC 5545), written one event at a
+# time so a feed streams like an export. Start times are stored as naive
+# local times and are written as "floating" times, which calendar clients
+# show unchanged in their own zone.
+#
+# Clients poll these feeds every few minutes. A poll first runs validators()
+# -- one aggregate over the feed's range, answered from the show indexes --
+# and gets a 304 while neither the newest updated_at nor the number of shows
+# has changed; only a changed feed is read and streamed. updated_at is only
+# ever compared with itself, so its time zone does not matter.
+
+from datetime import datetime
+
+from sqlalchemy import func
+
+
+MIMETYPE = 'text/calendar'
+
+
+def escape(text):
+    # TEXT values: backslash, semicolon, comma and newline are escaped
+    return (str(text or '').replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold(line):
+    # content lines are at most 75 octets; continuations start with a space
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line + '\r\n'
+    out = []
+    while len(data) > 75:
+        cut = 75 if not out else 74
+        # never split a multi-byte character
+        while data[cut] & 0xC0 == 0x80:
+            cut -= 1
+        out.append(data[:cut].decode('utf-8'))
+        data = data[cut:]
+    out.append(data.decode('utf-8'))
+    return '\r\n '.join(out) + '\r\n'
+
+
+def validators(session, owner, owner_id, shows, query):
+    # (name, last modified, ETag) of one venue's or artist's feed, from its
+    # row and the newest updated_at and number of the shows `query` selects,
+    # in one round trip; None if there is no such venue or artist. The count
+    # catches shows leaving the feed, which no updated_at records.
+    agg = query.with_entities(func.max(shows.updated_at).label('updated_at'),
+                              func.count().label('n')).subquery()
+    row = session.query(owner.name, owner.updated_at, agg.c.updated_at,
+                        agg.c.n).filter(owner.id == owner_id).first()
+    if row is None:
+        return None
+    name, updated_at, shows_updated_at, count = row
+    last_modified = max(updated_at, shows_updated_at or updated_at)
+    return name, last_modified, f'{last_modified.timestamp():.6f}-{count}'
+
+
+def feed_lines(name, shows, host):
+    # `shows` ordered by start_time
+    yield fold('BEGIN:VCALENDAR')
+    yield fold('VERSION:2.0')
+    yield fold('PRODID:-//Fyyur//Shows//EN')
+    yield fold('CALSCALE:GREGORIAN')
+    yield fold('X-WR-CALNAME:' + escape(name))
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    for show in shows:
+        if show.start_time is None:
+            continue
+        yield fold('BEGIN:VEVENT')
+        yield fold(f'UID:show-{show.show_id}@{host}')
+        yield fold(f'DTSTAMP:{stamp}')
+        yield fold(f"DTSTART:{show.start_time.strftime('%Y%m%dT%H%M%S')}")
+        yield fold(f"DTEND:{(show.start_time + show.duration).strftime('%Y%m%dT%H%M%S')}")
+        yield fold('SUMMARY:' + escape(show.artist_name))
+        yield fold('LOCATION:' + escape(show.venue_name))
+        yield fold('END:VEVENT')
+    yield fold('END:VCALENDAR')
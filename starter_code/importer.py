@@ -0,0 +1,358 @@
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+# Streams CSV or JSON Lines files into postgres: rows are validated against
+# the form vocabularies (choices.py), COPYed in batches into a temporary
+# staging table and upserted into the real table with one INSERT ... SELECT
+# at the end.
+# Shows take their artist/venue name and image copies from a join in that
+# same statement, and re-imported artists/venues refresh the copies on their
+# existing shows with one UPDATE ... FROM.
+# The whole file is one transaction. A key repeated in the file, or rows the
+# database refuses (e.g. a double-booked show, see bookings.py), raise
+# Conflict and nothing is imported.
+
+import csv
+import io
+import json
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from choices import STATES, GENRES
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+class Conflict(ValueError):
+    # the file's rows clash with each other or with the table
+    pass
+
+
+#  Readers
+#  ----------------------------------------------------------------
+
+def read_rows(path):
+    # yields (line number, dict) without loading the file
+    if path.endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            for n, row in enumerate(csv.DictReader(f), start=2):
+                yield n, row
+    elif path.endswith(('.jsonl', '.ndjson')):
+        with open(path, encoding='utf-8') as f:
+            for n, line in enumerate(f, start=1):
+                if line.strip():
+                    yield n, json.loads(line)
+    else:
+        raise ValueError(f'{path}: expected a .csv or .jsonl file')
+
+
+#  Validation
+#  ----------------------------------------------------------------
+
+def _optional(row, field):
+    value = row.get(field)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _required(row, field):
+    value = _optional(row, field)
+    if value is None:
+        raise InvalidRow(f'{field} is required')
+    return value
+
+
+def _integer(row, field, required=False):
+    value = _required(row, field) if required else _optional(row, field)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise InvalidRow(f'{field} must be an integer, got {value!r}')
+
+
+def _state(row):
+    value = _required(row, 'state').upper()
+    if value not in STATES:
+        raise InvalidRow(f'unknown state {value!r}')
+    return STATES.id(value)
+
+
+def _genres(row):
+    # a JSON list, or a ';'-separated CSV cell
+    value = row.get('genres') or []
+    if isinstance(value, str):
+        value = value.split(';')
+    genres = [g.strip() for g in value if g and g.strip()]
+    unknown = [g for g in genres if g not in GENRES]
+    if unknown:
+        raise InvalidRow(f'unknown genres {unknown!r}')
+    return [GENRES.id(g) for g in genres]
+
+
+def _start_time(row):
+    value = _required(row, 'start_time')
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise InvalidRow(f'start_time must be an ISO 8601 timestamp, got {value!r}')
+    if parsed.tzinfo is not None:
+        # start_time is a naive local time (timestamp without time zone),
+        # which would silently drop the offset; convert instead
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def _duration(row):
+    # minutes; None leaves the column default (2 hours)
+    minutes = _integer(row, 'duration')
+    if minutes is not None and minutes < 1:
+        raise InvalidRow(f'duration must be a positive number of minutes, got {minutes}')
+    return minutes
+
+
+def clean_venue(row):
+    return (_integer(row, 'id'), _required(row, 'name'), _required(row, 'city'),
+            _state(row), _required(row, 'address'), _optional(row, 'phone'),
+            _genres(row), _optional(row, 'image_link'),
+            _optional(row, 'facebook_link'), _optional(row, 'website'),
+            _optional(row, 'seeking_description'))
+
+
+def clean_artist(row):
+    return (_integer(row, 'id'), _required(row, 'name'), _required(row, 'city'),
+            _state(row), _optional(row, 'phone'), _genres(row),
+            _optional(row, 'image_link'), _optional(row, 'facebook_link'),
+            _optional(row, 'website'), _optional(row, 'seeking_description'))
+
+
+def clean_show(row):
+    return (_integer(row, 'show_id'), _integer(row, 'artist_id', required=True),
+            _integer(row, 'venue_id', required=True), _start_time(row),
+            _duration(row))
+
+
+#  Loading
+#  ----------------------------------------------------------------
+
+class Entity(object):
+
+    def __init__(self, table, key, columns, clean, upsert, refresh=None,
+                 staging_types=None):
+        self.table = table
+        self.key = key
+        self.columns = columns
+        self.clean = clean
+        self.upsert = upsert
+        self.refresh = refresh
+        # staging column -> SQL type, where it differs from the table's
+        self.staging_types = staging_types or {}
+
+    @property
+    def staging(self):
+        return f'import_{self.table}'
+
+
+def _upsert_sql(table, key, columns):
+    # a missing key takes the next value of the table's sequence
+    others = [c for c in columns if c != key]
+    return f"""
+        INSERT INTO {table} ({', '.join(columns)})
+        SELECT coalesce({key}, nextval(pg_get_serial_sequence('{table}', '{key}'))),
+               {', '.join(others)}
+        FROM import_{table}
+        ON CONFLICT ({key}) DO UPDATE SET
+            {', '.join(f'{c} = EXCLUDED.{c}' for c in others)}
+    """
+
+
+def _refresh_sql(table, prefix, fk):
+    return f"""
+        UPDATE shows SET {prefix}_name = s.name, {prefix}_image_link = s.image_link
+        FROM {table} s
+        WHERE shows.{fk} = s.id
+          AND s.id IN (SELECT id FROM import_{table} WHERE id IS NOT NULL)
+          AND (shows.{prefix}_name IS DISTINCT FROM s.name
+               OR shows.{prefix}_image_link IS DISTINCT FROM s.image_link)
+    """
+
+
+# table columns; states and genres are staged as their ids
+VENUE_COLUMNS = ['id', 'name', 'city', 'state_id', 'address', 'phone', 'genre_ids',
+                 'image_link', 'facebook_link', 'website', 'seeking_description']
+ARTIST_COLUMNS = ['id', 'name', 'city', 'state_id', 'phone', 'genre_ids',
+                  'image_link', 'facebook_link', 'website', 'seeking_description']
+# duration is staged as minutes, not as the table's interval
+SHOW_COLUMNS = ['show_id', 'artist_id', 'venue_id', 'start_time', 'duration']
+SHOW_STAGING_TYPES = {'duration': 'integer'}
+
+SHOWS_UPSERT = """
+    INSERT INTO shows (show_id, artist_id, venue_id, start_time, duration,
+                       artist_name, artist_image_link, venue_name, venue_image_link)
+    SELECT coalesce(i.show_id, nextval(pg_get_serial_sequence('shows', 'show_id'))),
+           i.artist_id, i.venue_id, i.start_time,
+           coalesce(make_interval(mins => i.duration), interval '2 hours'),
+           a.name, a.image_link, v.name, v.image_link
+    FROM import_shows i
+    JOIN artists a ON a.id = i.artist_id
+    JOIN venues v ON v.id = i.venue_id
+    ON CONFLICT (show_id) DO UPDATE SET
+        artist_id = EXCLUDED.artist_id,
+        venue_id = EXCLUDED.venue_id,
+        start_time = EXCLUDED.start_time,
+        duration = EXCLUDED.duration,
+        artist_name = EXCLUDED.artist_name,
+        artist_image_link = EXCLUDED.artist_image_link,
+        venue_name = EXCLUDED.venue_name,
+        venue_image_link = EXCLUDED.venue_image_link
+"""
+
+ENTITIES = {
+    'venues': Entity('venues', 'id', VENUE_COLUMNS, clean_venue,
+                     _upsert_sql('venues', 'id', VENUE_COLUMNS),
+                     _refresh_sql('venues', 'venue', 'venue_id')),
+    'artists': Entity('artists', 'id', ARTIST_COLUMNS, clean_artist,
+                      _upsert_sql('artists', 'id', ARTIST_COLUMNS),
+                      _refresh_sql('artists', 'artist', 'artist_id')),
+    'shows': Entity('shows', 'show_id', SHOW_COLUMNS, clean_show, SHOWS_UPSERT,
+                    staging_types=SHOW_STAGING_TYPES),
+}
+
+
+def _array_literal(values):
+    quoted = ('"' + str(v).replace('\\', '\\\\').replace('"', '\\"') + '"'
+              for v in values)
+    return '{' + ','.join(quoted) + '}'
+
+
+def _copy_value(value):
+    if isinstance(value, list):
+        return _array_literal(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class ImportResult(object):
+
+    def __init__(self):
+        self.read = 0
+        self.staged = 0
+        self.upserted = 0
+        self.refreshed = 0
+        self.errors = []
+        self.seconds = 0.0
+
+    @property
+    def skipped(self):
+        # rows that failed validation, or shows whose artist/venue is unknown
+        return self.read - self.upserted
+
+    @property
+    def rate(self):
+        return self.read / self.seconds if self.seconds else 0.0
+
+
+def _copy_batch(cursor, entity, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(v) for v in row])
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {entity.staging} ({', '.join(entity.columns)}) "
+        "FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+# Writes to shows take the counters' watermark FOR SHARE in their triggers
+# (counters.py), and `flask shows rollover` locks it before the venue and
+# artist rows it updates. A venue or artist upsert locks those rows before its
+# refresh reaches the trigger, so it takes the watermark first, in the
+# rollover's order, or the two deadlock.
+LOCK_WATERMARK = 'SELECT rolled_at FROM show_counts_rollover FOR SHARE'
+
+
+def _check_repeated_keys(session, entity, show=10):
+    # ON CONFLICT cannot update a row twice in one statement
+    keys = [r[0] for r in session.execute(text(
+        f'SELECT {entity.key} FROM {entity.staging} WHERE {entity.key} IS NOT NULL '
+        f'GROUP BY {entity.key} HAVING count(*) > 1 ORDER BY {entity.key} LIMIT {show}'))]
+    if keys:
+        session.rollback()
+        raise Conflict(f"{entity.table} not imported: {entity.key} "
+                       f"{', '.join(map(str, keys))} appear more than once in the file")
+
+
+def _describe(error):
+    # postgres names the constraint and the clashing keys, e.g. a show's
+    # (venue_id, slot) and the existing show it overlaps
+    diag = getattr(error.orig, 'diag', None)
+    if diag is not None and diag.message_primary:
+        return ' '.join(filter(None, (diag.message_primary, diag.message_detail)))
+    return str(error.orig)
+
+
+def load(session, name, path, batch_size=50000, max_errors=100,
+         progress=None):
+    # runs in one transaction: either every valid row lands or none does.
+    # `progress(result)` is called after each COPY batch.
+    entity = ENTITIES[name]
+    result = ImportResult()
+    started = time.monotonic()
+
+    columns = [f'NULL::{entity.staging_types[c]} AS {c}' if c in entity.staging_types
+               else c for c in entity.columns]
+    session.execute(text(
+        f'CREATE TEMP TABLE {entity.staging} ON COMMIT DROP AS '
+        f"SELECT {', '.join(columns)} FROM {entity.table} WITH NO DATA"))
+    cursor = session.connection().connection.cursor()
+
+    batch = []
+    for line, row in read_rows(path):
+        result.read += 1
+        try:
+            batch.append(entity.clean(row))
+        except InvalidRow as e:
+            result.errors.append((line, str(e)))
+            if len(result.errors) > max_errors:
+                raise InvalidRow(f'more than {max_errors} invalid rows, '
+                                 f'last at line {line}: {e}')
+            continue
+        if len(batch) >= batch_size:
+            _copy_batch(cursor, entity, batch)
+            result.staged += len(batch)
+            batch = []
+            if progress is not None:
+                result.seconds = time.monotonic() - started
+                progress(result)
+    if batch:
+        _copy_batch(cursor, entity, batch)
+        result.staged += len(batch)
+
+    session.execute(text(f'ANALYZE {entity.staging}'))
+    _check_repeated_keys(session, entity)
+    session.execute(text(LOCK_WATERMARK))
+    try:
+        result.upserted = session.execute(text(entity.upsert)).rowcount
+        if entity.refresh is not None:
+            result.refreshed = session.execute(text(entity.refresh)).rowcount
+    except IntegrityError as e:
+        session.rollback()
+        raise Conflict(f'{entity.table} not imported: {_describe(e)}')
+
+    # explicit keys in the file may have run past the sequence
+    session.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{entity.table}', '{entity.key}'), "
+        f"coalesce(max({entity.key}), 0) + 1, false) FROM {entity.table}"))
+    session.commit()
+
+    result.seconds = time.monotonic() - started
+    return result
@@ -0,0 +1,204 @@
+#----------------------------------------------------------------------------#
+# Request metrics.
+#----------------------------------------------------------------------------#
+# Per-endpoint latency histograms, SQL query counts, DB time and template
+# render time, served at /metrics in the Prometheus text format. Queries are
+# counted from SQLAlchemy's cursor events on every engine (primary and
+# replicas); a request running more than QUERY_BUDGET statements logs a
+# warning naming the endpoint, which is how N+1 loops show up.
+#
+# The numbers live in the worker process: with several gunicorn workers each
+# scrape sees one worker, so scrape them individually or aggregate with
+# sum() by endpoint.
+
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram(object):
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+class TimedTemplate(Template):
+    # adds the render time of every template to the current request
+
+    def render(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            if has_request_context():
+                g.metrics_template_seconds = (g.get('metrics_template_seconds', 0.0)
+                                              + time.perf_counter() - started)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{_label(v)}"' for k, v in labels.items()) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics(object):
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.latency = {}
+        self.queries = {}
+        self.requests = {}
+        self.totals = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.buckets = tuple(app.config['METRICS_LATENCY_BUCKETS'])
+        self.query_buckets = tuple(app.config['METRICS_QUERY_BUCKETS'])
+        self.query_budget = app.config['QUERY_BUDGET']
+        self.logger = app.logger
+
+        app.jinja_env.template_class = TimedTemplate
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        # engine-wide listeners, registered once however many apps are made
+        if not event.contains(Engine, 'after_cursor_execute', self._after_cursor):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor)
+        app.extensions['metrics'] = self
+
+    #  SQL events
+    #  ----------------------------------------------------------------
+
+    def _before_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    def _after_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['metrics_started'].pop()
+        if has_request_context() and 'metrics_started' in g:
+            g.metrics_queries += 1
+            g.metrics_db_seconds += elapsed
+
+    #  Request hooks
+    #  ----------------------------------------------------------------
+
+    def _start(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_db_seconds = 0.0
+
+    def _finish(self, response):
+        if 'metrics_started' not in g:
+            return response
+        elapsed = time.perf_counter() - g.metrics_started
+        # unmatched URLs share one label so 404 scans can't blow up the series
+        endpoint = request.endpoint or '<unmatched>'
+        method = request.method
+        key = (endpoint, method)
+
+        with self._lock:
+            if key not in self.latency:
+                self.latency[key] = Histogram(self.buckets)
+                self.queries[key] = Histogram(self.query_buckets)
+                self.totals[key] = {'db_seconds': 0.0, 'template_seconds': 0.0,
+                                    'queries': 0, 'over_budget': 0}
+            self.latency[key].observe(elapsed)
+            self.queries[key].observe(g.metrics_queries)
+            totals = self.totals[key]
+            totals['queries'] += g.metrics_queries
+            totals['db_seconds'] += g.metrics_db_seconds
+            totals['template_seconds'] += g.get('metrics_template_seconds', 0.0)
+            status = (endpoint, method, response.status_code)
+            self.requests[status] = self.requests.get(status, 0) + 1
+            over_budget = self.query_budget and g.metrics_queries > self.query_budget
+            if over_budget:
+                totals['over_budget'] += 1
+
+        if over_budget:
+            self.logger.warning(
+                f'{method} {request.path} ({endpoint}) ran {g.metrics_queries} '
+                f'queries, over the budget of {self.query_budget}')
+        return response
+
+    #  Exposition
+    #  ----------------------------------------------------------------
+
+    def render(self):
+        with self._lock:
+            latency = {k: (list(h.cumulative()), h.sum) for k, h in self.latency.items()}
+            queries = {k: (list(h.cumulative()), h.sum) for k, h in self.queries.items()}
+            requests = dict(self.requests)
+            totals = {k: dict(v) for k, v in self.totals.items()}
+
+        lines = []
+
+        def histogram(name, help, data):
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} histogram')
+            for (endpoint, method), (buckets, total) in sorted(data.items()):
+                for bound, count in buckets:
+                    lines.append(f'{name}_bucket'
+                                 f'{_labels(endpoint=endpoint, method=method, le=_number(bound))}'
+                                 f' {count}')
+                lines.append(f'{name}_sum{_labels(endpoint=endpoint, method=method)} '
+                             f'{_number(total)}')
+                lines.append(f'{name}_count{_labels(endpoint=endpoint, method=method)} '
+                             f'{buckets[-1][1]}')
+
+        def counter(name, help, field):
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} counter')
+            for (endpoint, method), values in sorted(totals.items()):
+                lines.append(f'{name}{_labels(endpoint=endpoint, method=method)} '
+                             f'{_number(values[field])}')
+
+        lines.append('# HELP fyyur_requests_total Requests handled, by status code.')
+        lines.append('# TYPE fyyur_requests_total counter')
+        for (endpoint, method, status), count in sorted(requests.items()):
+            lines.append(f'fyyur_requests_total'
+                         f'{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+
+        histogram('fyyur_request_duration_seconds', 'Request latency.', latency)
+        histogram('fyyur_request_queries', 'SQL statements per request.', queries)
+        counter('fyyur_db_queries_total', 'SQL statements executed.', 'queries')
+        counter('fyyur_db_seconds_total', 'Time spent executing SQL.', 'db_seconds')
+        counter('fyyur_template_seconds_total', 'Time spent rendering templates.',
+                'template_seconds')
+        counter('fyyur_query_budget_exceeded_total',
+                'Requests that ran more SQL statements than QUERY_BUDGET.', 'over_budget')
+        return '\n'.join(lines) + '\n'
+
+    def response(self):
+        return Response(self.render(), mimetype=None, content_type=CONTENT_TYPE)
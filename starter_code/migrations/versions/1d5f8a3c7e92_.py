@@ -0,0 +1,42 @@
+"""index the null-safe listing keys of venues and artists
+
+Revision ID: 1d5f8a3c7e92
+Revises: f3a9c6e2b071
+Create Date: 2026-10-18 21:36:12.508913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1d5f8a3c7e92'
+down_revision = 'f3a9c6e2b071'
+branch_labels = None
+depends_on = None
+
+
+# Keyset pages sort and compare nullable keys as coalesce(key, lowest value)
+# (pagination.py); these indexes are on the same expressions, so a page is
+# still one index range scan. ix_artists_name_id only served those pages;
+# ix_venues_state_city_name_id stays for state and city lookups.
+VENUES = "coalesce(state_id, 0), coalesce(city, ''), coalesce(name, ''), id"
+ARTISTS = "coalesce(name, ''), id"
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.execute('CREATE INDEX CONCURRENTLY ix_venues_listing_key ON venues '
+                   f'({VENUES})')
+        op.execute('CREATE INDEX CONCURRENTLY ix_artists_listing_key ON artists '
+                   f'({ARTISTS})')
+        op.drop_index('ix_artists_name_id', table_name='artists',
+                      postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_artists_name_id', 'artists', ['name', 'id'],
+                        postgresql_concurrently=True)
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_artists_listing_key')
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_venues_listing_key')
@@ -0,0 +1,58 @@
+"""search indexes for venues and artists
+
+Revision ID: 2b7e4c1d9a0f
+Revises: 85ed03a2a760
+Create Date: 2026-10-18 10:12:41.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b7e4c1d9a0f'
+down_revision = '85ed03a2a760'
+branch_labels = None
+depends_on = None
+
+
+# array_to_string() is only STABLE, so the search expressions are wrapped in
+# IMMUTABLE functions that can be indexed. search.py calls the same functions.
+SEARCH_TEXT = """
+CREATE OR REPLACE FUNCTION fyyur_search_text(
+    name varchar, city varchar, state varchar, genres varchar[])
+RETURNS text AS $$
+    SELECT lower(concat_ws(' ', name, city, state, array_to_string(genres, ' ')))
+$$ LANGUAGE sql IMMUTABLE
+"""
+
+SEARCH_DOCUMENT = """
+CREATE OR REPLACE FUNCTION fyyur_search_document(
+    name varchar, city varchar, state varchar, genres varchar[])
+RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('simple', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('simple', concat_ws(' ', city, state)), 'B')
+        || setweight(to_tsvector('simple', coalesce(array_to_string(genres, ' '), '')), 'C')
+$$ LANGUAGE sql IMMUTABLE
+"""
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute(SEARCH_TEXT)
+    op.execute(SEARCH_DOCUMENT)
+    for table in ('venues', 'artists'):
+        op.execute(
+            f'CREATE INDEX ix_{table}_search_trgm ON {table} USING gin '
+            '(fyyur_search_text(name, city, state, genres) gin_trgm_ops)')
+        op.execute(
+            f'CREATE INDEX ix_{table}_search_document ON {table} USING gin '
+            '(fyyur_search_document(name, city, state, genres))')
+
+
+def downgrade():
+    for table in ('venues', 'artists'):
+        op.drop_index(f'ix_{table}_search_document', table_name=table)
+        op.drop_index(f'ix_{table}_search_trgm', table_name=table)
+    op.execute('DROP FUNCTION IF EXISTS fyyur_search_document(varchar, varchar, varchar, varchar[])')
+    op.execute('DROP FUNCTION IF EXISTS fyyur_search_text(varchar, varchar, varchar, varchar[])')
@@ -0,0 +1,42 @@
+"""performance indexes for shows and genres
+
+Revision ID: 5e8b2f0c6a93
+Revises: d41a8e6b7c25
+Create Date: 2026-10-18 16:25:12.377905
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8b2f0c6a93'
+down_revision = 'd41a8e6b7c25'
+branch_labels = None
+depends_on = None
+
+
+# venues(state, city) is already served by ix_venues_state_city_name_id
+# (9c3f5a7e2d14), whose leading columns are the same.
+INDEXES = [
+    ('ix_shows_venue_id_start_time', 'shows', ['venue_id', 'start_time'], {}),
+    ('ix_shows_artist_id_start_time', 'shows', ['artist_id', 'start_time'], {}),
+    ('ix_venues_genres', 'venues', ['genres'], {'postgresql_using': 'gin'}),
+    ('ix_artists_genres', 'artists', ['genres'], {'postgresql_using': 'gin'}),
+]
+
+
+def upgrade():
+    # CONCURRENTLY builds without blocking writes, but cannot run inside a
+    # transaction. If a build fails it leaves an INVALID index behind: drop it
+    # and run the upgrade again.
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in INDEXES:
+            op.create_index(name, table, columns,
+                            postgresql_concurrently=True, **kwargs)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
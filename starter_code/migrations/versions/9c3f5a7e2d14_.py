@@ -0,0 +1,29 @@
+"""keyset pagination indexes
+
+Revision ID: 9c3f5a7e2d14
+Revises: 2b7e4c1d9a0f
+Create Date: 2026-10-18 11:40:05.502317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3f5a7e2d14'
+down_revision = '2b7e4c1d9a0f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # one index per listing sort key, so every page is a single index range scan
+    op.create_index('ix_artists_name_id', 'artists', ['name', 'id'])
+    op.create_index('ix_venues_state_city_name_id', 'venues', ['state', 'city', 'name', 'id'])
+    op.create_index('ix_shows_start_time_show_id', 'shows', ['start_time', 'show_id'])
+
+
+def downgrade():
+    op.drop_index('ix_shows_start_time_show_id', table_name='shows')
+    op.drop_index('ix_venues_state_city_name_id', table_name='venues')
+    op.drop_index('ix_artists_name_id', table_name='artists')
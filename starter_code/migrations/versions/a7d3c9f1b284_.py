@@ -0,0 +1,178 @@
+"""states and genres lookup tables
+
+Revision ID: a7d3c9f1b284
+Revises: 5e8b2f0c6a93
+Create Date: 2026-10-18 18:04:51.630417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3c9f1b284'
+down_revision = '5e8b2f0c6a93'
+branch_labels = None
+depends_on = None
+
+
+# frozen copy of choices.py at this revision; ids are positions, 1-based
+STATES = ['AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'DC', 'FL', 'GA',
+          'HI', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MT', 'NE',
+          'NV', 'NH', 'NJ', 'NM', 'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'MD',
+          'MA', 'MI', 'MN', 'MS', 'MO', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX',
+          'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY']
+GENRES = ['Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+          'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+          'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll',
+          'Soul', 'Other']
+
+TABLES = ('venues', 'artists')
+
+
+def _array(values):
+    return 'ARRAY[' + ', '.join("'" + v.replace("'", "''") + "'" for v in values) + ']'
+
+
+# Names from ids for the search indexes. Reading the lookup tables would make
+# them STABLE, which can't be indexed, so the vocabulary is inlined; a
+# migration that adds a state or genre redefines them and reindexes.
+STATE_CODE = f"""
+CREATE OR REPLACE FUNCTION fyyur_state_code(state_id smallint)
+RETURNS varchar AS $$
+    SELECT ({_array(STATES)}::varchar[])[state_id]
+$$ LANGUAGE sql IMMUTABLE
+"""
+
+GENRE_NAMES = f"""
+CREATE OR REPLACE FUNCTION fyyur_genre_names(genre_ids smallint[])
+RETURNS varchar[] AS $$
+    SELECT array_agg(({_array(GENRES)}::varchar[])[g] ORDER BY n)
+    FROM unnest(genre_ids) WITH ORDINALITY AS u(g, n)
+$$ LANGUAGE sql IMMUTABLE
+"""
+
+SEARCH_TEXT = ('fyyur_search_text(name, city, fyyur_state_code(state_id), '
+               'fyyur_genre_names(genre_ids))')
+SEARCH_DOCUMENT = ('fyyur_search_document(name, city, fyyur_state_code(state_id), '
+                   'fyyur_genre_names(genre_ids))')
+
+
+# Refuses to backfill values outside the vocabulary rather than dropping them:
+# the upgrade stops, naming them, so they can be corrected (or added to
+# choices.py and the lists above) and the upgrade run again. A blank state
+# carries nothing and becomes NULL.
+CHECK_VOCABULARY = """
+DO $$
+DECLARE
+    bad_states text;
+    bad_genres text;
+BEGIN
+    SELECT string_agg(DISTINCT t.state, ', ') INTO bad_states
+    FROM {table} t
+    WHERE t.state <> '' AND upper(t.state) NOT IN (SELECT code FROM states);
+    SELECT string_agg(DISTINCT u.name, ', ') INTO bad_genres
+    FROM {table} t, unnest(t.genres) AS u(name)
+    WHERE u.name NOT IN (SELECT name FROM genres);
+    IF bad_states IS NOT NULL OR bad_genres IS NOT NULL THEN
+        RAISE EXCEPTION USING
+            MESSAGE = '{table} has values outside the vocabulary, states ('
+                      || coalesce(bad_states, 'none') || '), genres ('
+                      || coalesce(bad_genres, 'none') || ')',
+            HINT = 'Correct them, or add them to choices.py and this migration.';
+    END IF;
+END
+$$
+"""
+
+
+def _drop_indexes(table):
+    op.drop_index(f'ix_{table}_search_document', table_name=table)
+    op.drop_index(f'ix_{table}_search_trgm', table_name=table)
+    op.drop_index(f'ix_{table}_genres', table_name=table)
+    if table == 'venues':
+        op.drop_index('ix_venues_state_city_name_id', table_name='venues')
+
+
+def upgrade():
+    states = op.create_table(
+        'states',
+        sa.Column('id', sa.SmallInteger(), autoincrement=False, nullable=False),
+        sa.Column('code', sa.String(length=2), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('code'))
+    genres = op.create_table(
+        'genres',
+        sa.Column('id', sa.SmallInteger(), autoincrement=False, nullable=False),
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'))
+    op.bulk_insert(states, [{'id': i, 'code': c} for i, c in enumerate(STATES, 1)])
+    op.bulk_insert(genres, [{'id': i, 'name': g} for i, g in enumerate(GENRES, 1)])
+    op.execute(STATE_CODE)
+    op.execute(GENRE_NAMES)
+
+    for table in TABLES:
+        op.add_column(table, sa.Column('state_id', sa.SmallInteger(), nullable=True))
+        op.add_column(table, sa.Column('genre_ids', postgresql.ARRAY(sa.SmallInteger()),
+                                       nullable=True))
+        op.create_foreign_key(f'{table}_state_id_fkey', table, 'states',
+                              ['state_id'], ['id'])
+
+        # the backfill rewrites every row; it is not an edit, so keep
+        # updated_at (and with it incremental exports) as it was
+        op.execute(CHECK_VOCABULARY.format(table=table))
+        op.execute(f'ALTER TABLE {table} DISABLE TRIGGER {table}_touch_updated_at')
+        op.execute(f"""
+            UPDATE {table} t SET
+                state_id = (SELECT s.id FROM states s WHERE s.code = upper(t.state)),
+                genre_ids = (SELECT array_agg(g.id ORDER BY u.n)
+                             FROM unnest(t.genres) WITH ORDINALITY AS u(name, n)
+                             JOIN genres g ON g.name = u.name)
+        """)
+        op.execute(f'ALTER TABLE {table} ENABLE TRIGGER {table}_touch_updated_at')
+
+        _drop_indexes(table)
+        op.drop_column(table, 'genres')
+        op.drop_column(table, 'state')
+
+        op.create_index(f'ix_{table}_genres', table, ['genre_ids'],
+                        postgresql_using='gin')
+        op.execute(f'CREATE INDEX ix_{table}_search_trgm ON {table} USING gin '
+                   f'({SEARCH_TEXT} gin_trgm_ops)')
+        op.execute(f'CREATE INDEX ix_{table}_search_document ON {table} USING gin '
+                   f'({SEARCH_DOCUMENT})')
+    op.create_index('ix_venues_state_city_name_id', 'venues',
+                    ['state_id', 'city', 'name', 'id'])
+    op.execute('ANALYZE venues')
+    op.execute('ANALYZE artists')
+
+
+def downgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('state', sa.String(length=120), nullable=True))
+        op.add_column(table, sa.Column('genres', postgresql.ARRAY(sa.String()),
+                                       nullable=True))
+        op.execute(f'ALTER TABLE {table} DISABLE TRIGGER {table}_touch_updated_at')
+        op.execute(f'UPDATE {table} SET state = fyyur_state_code(state_id), '
+                   'genres = fyyur_genre_names(genre_ids)')
+        op.execute(f'ALTER TABLE {table} ENABLE TRIGGER {table}_touch_updated_at')
+
+        _drop_indexes(table)
+        op.drop_constraint(f'{table}_state_id_fkey', table, type_='foreignkey')
+        op.drop_column(table, 'genre_ids')
+        op.drop_column(table, 'state_id')
+
+        op.create_index(f'ix_{table}_genres', table, ['genres'], postgresql_using='gin')
+        op.execute(f'CREATE INDEX ix_{table}_search_trgm ON {table} USING gin '
+                   '(fyyur_search_text(name, city, state, genres) gin_trgm_ops)')
+        op.execute(f'CREATE INDEX ix_{table}_search_document ON {table} USING gin '
+                   '(fyyur_search_document(name, city, state, genres))')
+    op.create_index('ix_venues_state_city_name_id', 'venues',
+                    ['state', 'city', 'name', 'id'])
+
+    op.execute('DROP FUNCTION IF EXISTS fyyur_genre_names(smallint[])')
+    op.execute('DROP FUNCTION IF EXISTS fyyur_state_code(smallint)')
+    op.drop_table('genres')
+    op.drop_table('states')
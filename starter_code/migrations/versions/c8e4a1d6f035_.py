@@ -0,0 +1,134 @@
+"""upcoming and past show counters on venues and artists
+
+Revision ID: c8e4a1d6f035
+Revises: a7d3c9f1b284
+Create Date: 2026-10-18 19:12:06.214538
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e4a1d6f035'
+down_revision = 'a7d3c9f1b284'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('venues', 'artists')
+COUNTERS = ('upcoming_shows_count', 'past_shows_count')
+
+# Shows starting after show_counts_rollover.rolled_at are counted as
+# upcoming, the others as past; `flask shows rollover` (counters.py) moves the
+# watermark forward. Inserts, deletes (including the cascades from deleting
+# a venue or artist) and updates of shows adjust the counters through
+# statement-level triggers, so a bulk import is one grouped UPDATE per table
+# rather than one per row. FOR SHARE makes a write wait for a running
+# rollover batch, and the batch for the writes it has not seen yet.
+COUNT_FUNCTION = """
+CREATE OR REPLACE FUNCTION fyyur_count_shows_{op}() RETURNS trigger AS $$
+DECLARE
+    rolled timestamp;
+BEGIN
+    SELECT rolled_at INTO rolled FROM show_counts_rollover FOR SHARE;{updates}
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+COUNT_UPDATE = """
+    UPDATE {table} t SET
+        upcoming_shows_count = t.upcoming_shows_count + d.upcoming,
+        past_shows_count = t.past_shows_count + d.past
+    FROM (SELECT {fk} AS id,
+                 coalesce(sum(n) FILTER (WHERE start_time > rolled), 0) AS upcoming,
+                 coalesce(sum(n) FILTER (WHERE start_time <= rolled), 0) AS past
+          FROM ({delta}) delta GROUP BY {fk}) d
+    WHERE t.id = d.id AND (d.upcoming <> 0 OR d.past <> 0);"""
+
+DELTAS = {
+    'insert': 'SELECT venue_id, artist_id, start_time, 1 AS n FROM new_shows',
+    'delete': 'SELECT venue_id, artist_id, start_time, -1 AS n FROM old_shows',
+    'update': 'SELECT venue_id, artist_id, start_time, 1 AS n FROM new_shows '
+              'UNION ALL '
+              'SELECT venue_id, artist_id, start_time, -1 AS n FROM old_shows',
+}
+
+REFERENCING = {
+    'insert': 'NEW TABLE AS new_shows',
+    'delete': 'OLD TABLE AS old_shows',
+    'update': 'OLD TABLE AS old_shows NEW TABLE AS new_shows',
+}
+
+# counter-only updates are not edits of the venue or artist, so they leave
+# updated_at (and incremental exports) alone
+TOUCH_UNLESS_COUNTERS = """
+CREATE TRIGGER {table}_touch_updated_at BEFORE UPDATE ON {table}
+FOR EACH ROW WHEN (
+    (OLD.upcoming_shows_count, OLD.past_shows_count)
+        IS NOT DISTINCT FROM (NEW.upcoming_shows_count, NEW.past_shows_count)
+    OR to_jsonb(OLD) - 'upcoming_shows_count' - 'past_shows_count'
+        IS DISTINCT FROM to_jsonb(NEW) - 'upcoming_shows_count' - 'past_shows_count')
+EXECUTE PROCEDURE fyyur_touch_updated_at()
+"""
+
+
+def _count_function(op_name):
+    updates = ''.join(
+        COUNT_UPDATE.format(table=table, fk=fk, delta=DELTAS[op_name])
+        for table, fk in (('venues', 'venue_id'), ('artists', 'artist_id')))
+    return COUNT_FUNCTION.format(op=op_name, updates=updates)
+
+
+def upgrade():
+    # no show may be written between the backfill and the triggers
+    op.execute('LOCK TABLE shows IN SHARE ROW EXCLUSIVE MODE')
+
+    op.create_table(
+        'show_counts_rollover',
+        sa.Column('rolled_at', sa.DateTime(), nullable=False))
+    # the app compares start_time with its local, naive datetime.now()
+    op.execute('INSERT INTO show_counts_rollover (rolled_at) VALUES (localtimestamp)')
+
+    for table in TABLES:
+        for counter in COUNTERS:
+            op.add_column(table, sa.Column(counter, sa.Integer(), nullable=False,
+                                           server_default='0'))
+        op.execute(f'DROP TRIGGER {table}_touch_updated_at ON {table}')
+        op.execute(TOUCH_UNLESS_COUNTERS.format(table=table))
+
+    for table, fk in (('venues', 'venue_id'), ('artists', 'artist_id')):
+        op.execute(f"""
+            UPDATE {table} t SET
+                upcoming_shows_count = c.upcoming,
+                past_shows_count = c.past
+            FROM (SELECT s.{fk} AS id,
+                         count(*) FILTER (WHERE s.start_time > r.rolled_at) AS upcoming,
+                         count(*) FILTER (WHERE s.start_time <= r.rolled_at) AS past
+                  FROM shows s, show_counts_rollover r GROUP BY s.{fk}) c
+            WHERE t.id = c.id
+        """)
+
+    for op_name in DELTAS:
+        op.execute(_count_function(op_name))
+        op.execute(
+            f'CREATE TRIGGER shows_count_{op_name} AFTER {op_name.upper()} ON shows '
+            f'REFERENCING {REFERENCING[op_name]} '
+            f'FOR EACH STATEMENT EXECUTE PROCEDURE fyyur_count_shows_{op_name}()')
+
+
+def downgrade():
+    for op_name in DELTAS:
+        op.execute(f'DROP TRIGGER IF EXISTS shows_count_{op_name} ON shows')
+        op.execute(f'DROP FUNCTION IF EXISTS fyyur_count_shows_{op_name}()')
+
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER {table}_touch_updated_at ON {table}')
+        op.execute(
+            f'CREATE TRIGGER {table}_touch_updated_at BEFORE UPDATE ON {table} '
+            'FOR EACH ROW EXECUTE PROCEDURE fyyur_touch_updated_at()')
+        for counter in COUNTERS:
+            op.drop_column(table, counter)
+
+    op.drop_table('show_counts_rollover')
@@ -0,0 +1,50 @@
+"""updated_at columns for incremental exports
+
+Revision ID: d41a8e6b7c25
+Revises: 9c3f5a7e2d14
+Create Date: 2026-10-18 14:02:37.840126
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41a8e6b7c25'
+down_revision = '9c3f5a7e2d14'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('venues', 'artists', 'shows')
+
+# maintained in the database so set-based UPDATEs and imports bump it too.
+# now() is the transaction's start, not its commit; incremental exports read
+# with an overlap for that (exporter.py).
+TOUCH_FUNCTION = """
+CREATE OR REPLACE FUNCTION fyyur_touch_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := now();
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade():
+    op.execute(TOUCH_FUNCTION)
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                       server_default=sa.text('now()')))
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'])
+        op.execute(
+            f'CREATE TRIGGER {table}_touch_updated_at BEFORE UPDATE ON {table} '
+            'FOR EACH ROW EXECUTE PROCEDURE fyyur_touch_updated_at()')
+
+
+def downgrade():
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_touch_updated_at ON {table}')
+        op.drop_index(f'ix_{table}_updated_at', table_name=table)
+        op.drop_column(table, 'updated_at')
+    op.execute('DROP FUNCTION IF EXISTS fyyur_touch_updated_at()')
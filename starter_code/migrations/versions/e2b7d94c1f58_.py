@@ -0,0 +1,31 @@
+"""index venues by city for date-range show queries
+
+Revision ID: e2b7d94c1f58
+Revises: c8e4a1d6f035
+Create Date: 2026-10-18 19:48:33.905172
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b7d94c1f58'
+down_revision = 'c8e4a1d6f035'
+branch_labels = None
+depends_on = None
+
+
+# /shows?city= finds the city's venues here, then their shows in the range
+# through ix_shows_venue_id_start_time. ix_venues_state_city_name_id only
+# serves a city together with its state.
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_venues_city', 'venues', ['city'],
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_venues_city', table_name='venues',
+                      postgresql_concurrently=True)
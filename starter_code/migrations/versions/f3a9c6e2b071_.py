@@ -0,0 +1,52 @@
+"""show durations and no double bookings
+
+Revision ID: f3a9c6e2b071
+Revises: e2b7d94c1f58
+Create Date: 2026-10-18 20:21:47.518306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9c6e2b071'
+down_revision = 'e2b7d94c1f58'
+branch_labels = None
+depends_on = None
+
+
+SLOT = ('CASE WHEN start_time IS NULL THEN NULL '
+        'ELSE tsrange(start_time, start_time + duration) END')
+
+
+def upgrade():
+    # GiST operator classes for plain integers, so venue_id = ... and
+    # slot && ... fit in one index
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+
+    op.add_column('shows', sa.Column('duration', sa.Interval(), nullable=False,
+                                     server_default=sa.text("'2 hours'")))
+    op.create_check_constraint('ck_shows_duration_positive', 'shows',
+                               "duration > interval '0'")
+    # [start_time, start_time + duration). tsrange(NULL, NULL) would be the
+    # unbounded range (,), blocking the venue and artist for all time, so a
+    # show without a start_time gets a NULL slot and is never in conflict
+    op.execute(f'ALTER TABLE shows ADD COLUMN slot tsrange GENERATED ALWAYS AS '
+               f'({SLOT}) STORED')
+
+    # Each constraint's GiST index also answers availability lookups. Adding
+    # one fails if the table already holds a double booking; the error names
+    # a conflicting pair, which has to be resolved before running it again.
+    op.execute('ALTER TABLE shows ADD CONSTRAINT shows_venue_id_slot_excl '
+               'EXCLUDE USING gist (venue_id WITH =, slot WITH &&)')
+    op.execute('ALTER TABLE shows ADD CONSTRAINT shows_artist_id_slot_excl '
+               'EXCLUDE USING gist (artist_id WITH =, slot WITH &&)')
+
+
+def downgrade():
+    op.drop_constraint('shows_artist_id_slot_excl', 'shows')
+    op.drop_constraint('shows_venue_id_slot_excl', 'shows')
+    op.drop_column('shows', 'slot')
+    op.drop_constraint('ck_shows_duration_positive', 'shows', type_='check')
+    op.drop_column('shows', 'duration')
@@ -0,0 +1,174 @@
+from sqlalchemy import func, text, Computed, SmallInteger
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.types import TypeDecorator
+from routing import RoutingSQLAlchemy
+from choices import STATES, GENRES
+
+# routes reads to replicas where configured, see routing.py
+db = RoutingSQLAlchemy()
+
+
+#----------------------------------------------------------------------------#
+# Vocabulary columns.
+#----------------------------------------------------------------------------#
+# States and genres are stored as smallint ids referencing the states and
+# genres tables, and read and written as their names, so the rest of the app
+# keeps using venue.state == 'CA' and venue.genres == ['Jazz', 'Soul'].
+
+
+class StateCode(TypeDecorator):
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else STATES.id(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else STATES.name(value)
+
+
+class GenreNames(TypeDecorator):
+    impl = postgresql.ARRAY(SmallInteger)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else [GENRES.id(g) for g in value]
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else [GENRES.name(g) for g in value]
+
+
+class State(db.Model):
+    __tablename__ = 'states'
+
+    id = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    code = db.Column(db.String(2), nullable=False, unique=True)
+
+
+class Genre(db.Model):
+    __tablename__ = 'genres'
+
+    id = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(50), nullable=False, unique=True)
+
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+
+
+class Venue(db.Model):
+    __tablename__ = 'venues'
+    # mirrors the migrations, so autogenerate does not try to drop them
+    __table_args__ = (
+        db.Index('ix_venues_state_city_name_id', 'state_id', 'city', 'name', 'id'),
+        db.Index('ix_venues_genres', 'genre_ids', postgresql_using='gin'),
+        db.Index('ix_venues_city', 'city'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column('state_id', StateCode, db.ForeignKey('states.id'))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    genres = db.Column('genre_ids', GenreNames)
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    website = db.Column(db.String(120))
+    seeking_description = db.Column(db.String(120))
+    updated_at = db.Column(db.DateTime, nullable=False, index=True,
+                           server_default=func.now())
+    # maintained by triggers on shows, see counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, server_default='0')
+    # deleting a venue leaves its shows to ON DELETE CASCADE (which the
+    # counter triggers see) instead of nulling their venue_id; shows already
+    # loaded are deleted by the session
+    venue_show = db.relationship(
+        'Shows', backref='venue_show', order_by='Shows.start_time',
+        cascade='save-update, merge, delete', passive_deletes=True)
+
+    def __repr__(self):
+        return f'< Venue id: {self.id}, name: {self.name}, city: {self.city}, state: {self.state}, address: {self.address},phone: {self.phone}, genres: {self.genres}, image_link: {self.image_link}, facebook_link: {self.facebook_link}, website: {self.website}, seeking_description: {self.seeking_description}>'
+
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+
+
+class Artist(db.Model):
+    __tablename__ = 'artists'
+    __table_args__ = (
+        db.Index('ix_artists_genres', 'genre_ids', postgresql_using='gin'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column('state_id', StateCode, db.ForeignKey('states.id'))
+    phone = db.Column(db.String(120))
+    genres = db.Column('genre_ids', GenreNames)
+    image_link = db.Column(db.String(500))
+    website = db.Column(db.String(120))
+    facebook_link = db.Column(db.String(120))
+    seeking_description = db.Column(db.String(120))
+    updated_at = db.Column(db.DateTime, nullable=False, index=True,
+                           server_default=func.now())
+    # maintained by triggers on shows, see counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, server_default='0')
+    # deleting a artist leaves its shows to ON DELETE CASCADE (which the
+    # counter triggers see) instead of nulling their artist_id; shows already
+    # loaded are deleted by the session
+    artist_show = db.relationship(
+        'Shows', backref='artist_show', order_by='Shows.start_time',
+        cascade='save-update, merge, delete', passive_deletes=True)
+
+    def __repr__(self):
+        return f'< Artist id: {self.id}, name: {self.name}, city: {self.city}, state: {self.state},phone: {self.phone}, genres: {self.genres}, image_link: {self.image_link}, facebook_link: {self.facebook_link},website: {self.website}, seeking_description: {self.seeking_description} >'
+
+# TODO: implement any missing fields, as a database migration using Flask-Migrate
+
+# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+
+
+class Shows(db.Model):
+    __tablename__ = 'shows'
+    __table_args__ = (
+        db.Index('ix_shows_start_time_show_id', 'start_time', 'show_id'),
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        # no venue or artist is booked twice at once, see bookings.py
+        postgresql.ExcludeConstraint(('venue_id', '='), ('slot', '&&'),
+                                     using='gist', name='shows_venue_id_slot_excl'),
+        postgresql.ExcludeConstraint(('artist_id', '='), ('slot', '&&'),
+                                     using='gist', name='shows_artist_id_slot_excl'),
+        db.CheckConstraint("duration > interval '0'", name='ck_shows_duration_positive'),
+    )
+
+    show_id = db.Column(db.Integer, primary_key=True, nullable=False)
+    artist_id = db.Column(db.Integer, db.ForeignKey(
+        'artists.id', ondelete="CASCADE"))
+    venue_id = db.Column(db.Integer, db.ForeignKey(
+        'venues.id', ondelete="CASCADE"))
+    venue_name = db.Column(db.String)
+    artist_name = db.Column(db.String)
+    artist_image_link = db.Column(db.String(500))
+    venue_image_link = db.Column(db.String(500))
+    start_time = db.Column(db.DateTime())
+    duration = db.Column(db.Interval, nullable=False, server_default=text("'2 hours'"))
+    # [start_time, start_time + duration), maintained by postgres; NULL
+    # without a start_time (see migration f3a9c6e2b071)
+    slot = db.Column(postgresql.TSRANGE,
+                     Computed('CASE WHEN start_time IS NULL THEN NULL '
+                              'ELSE tsrange(start_time, start_time + duration) END',
+                              persisted=True))
+    updated_at = db.Column(db.DateTime, nullable=False, index=True,
+                           server_default=func.now())
+
+    def __repr__(self):
+        return f'<Shows show_id: {self.show_id}, artist_id: {self.artist_id}, venue_id: {self.venue_id}, start_time: {self.start_time}>'
+
+
+# one row: shows starting after rolled_at count as upcoming, see counters.py
+show_counts_rollover = db.Table(
+    'show_counts_rollover',
+    db.Column('rolled_at', db.DateTime, nullable=False))
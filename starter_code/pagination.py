@@ -0,0 +1,131 @@
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#----------------------------------------------------------------------------#
+# Pages are addressed by an opaque cursor holding the sort key of the row at
+# the page boundary, e.g. (name, id) for artists or (start_time, show_id) for
+# shows. Each page is a row-value comparison on an indexed key followed by a
+# LIMIT, so page N costs the same as page 1 (unlike OFFSET, which still reads
+# and discards every preceding row).
+#
+# A NULL key would make the comparison NULL and drop its row from every page
+# but the first, so a nullable key is sorted and compared as coalesce(key,
+# lowest value of its type): NULLs come first, and the indexes behind the
+# listings are built on the same expressions (migration 1d5f8a3c7e92).
+
+import base64
+import json
+from datetime import datetime
+from flask import request, url_for
+from sqlalchemy import tuple_, func, literal, literal_column, DateTime, Integer
+
+
+class Page(object):
+
+    def __init__(self, items, limit, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.limit = limit
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v
+                      for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, keys):
+    # returns None for a missing or malformed cursor, i.e. the first page
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(keys):
+            return None
+        return [datetime.fromisoformat(v) if isinstance(k.type, DateTime) else v
+                for k, v in zip(keys, values)]
+    except (ValueError, TypeError):
+        return None
+
+
+def page_size(requested, default, maximum):
+    if requested is None or requested < 1:
+        return default
+    return min(requested, maximum)
+
+
+def _lowest(type_):
+    # sorts before every value of the columns we page by: ids start at 1
+    impl = getattr(type_, 'impl', type_)
+    if isinstance(impl, DateTime):
+        return literal_column("'-infinity'::timestamp")
+    if isinstance(impl, Integer):
+        return literal_column('0')
+    return literal_column("''")
+
+
+def _sort_key(key, value, nullable):
+    # bind each cursor value with its key's type, so type conversions (e.g.
+    # a state code to its id) apply inside the row-value comparison too
+    bound = literal(value, type_=key.type)
+    if not nullable:
+        return bound
+    return func.coalesce(bound, _lowest(key.type))
+
+
+def paginate(query, keys, key_of, limit, after=None, before=None, nullable=None):
+    # `keys` are the ascending sort columns (unique together), `key_of` maps a
+    # result row back to its key values for the next/prev cursors. `nullable`
+    # are the keys that may be NULL in `query`'s rows, by default the
+    # nullable columns among `keys`.
+    if nullable is None:
+        nullable = [k for k in keys if getattr(k, 'nullable', False)]
+    flags = [any(k is n for n in nullable) for k in keys]
+    order = [func.coalesce(k, _lowest(k.type)) if f else k for k, f in zip(keys, flags)]
+
+    def bound(values):
+        return tuple_(*[_sort_key(k, v, f) for k, v, f in zip(keys, values, flags)])
+
+    after = decode_cursor(after, keys)
+    before = decode_cursor(before, keys) if after is None else None
+
+    if before is not None:
+        rows = query.filter(tuple_(*order) < bound(before)).order_by(
+            *[k.desc() for k in order]).limit(limit + 1).all()
+        more = len(rows) > limit
+        rows = rows[:limit][::-1]
+        has_prev, has_next = more, True
+    else:
+        q = query
+        if after is not None:
+            q = q.filter(tuple_(*order) > bound(after))
+        rows = q.order_by(*order).limit(limit + 1).all()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        has_prev, has_next = after is not None, more
+
+    if not rows:
+        return Page(rows, limit)
+
+    return Page(
+        rows, limit,
+        next_cursor=encode_cursor(key_of(rows[-1])) if has_next else None,
+        prev_cursor=encode_cursor(key_of(rows[0])) if has_prev else None)
+
+
+def page_url(**cursor):
+    # the current listing (filters and ?limit= kept) at another cursor
+    args = request.args.to_dict(flat=False)
+    args.pop('after', None)
+    args.pop('before', None)
+    args.update(cursor)
+    return url_for(request.endpoint, **args)
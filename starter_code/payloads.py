@@ -0,0 +1,91 @@
+#----------------------------------------------------------------------------#
+# Payloads.
+#----------------------------------------------------------------------------#
+# The dicts the pages render, built in one place so the HTML views and the
+# JSON API (api.py) stay in step.
+
+
+def split_shows(shows, fields, now):
+    # `shows` ordered by start_time; split against one timestamp so every
+    # show lands in exactly one list. A show without a start_time is in
+    # neither, as in the show counters and the .ics feeds.
+    past = []
+    coming = []
+
+    for i in shows:
+        if i.start_time is None:
+            continue
+        show = {f: getattr(i, f) for f in fields}
+        if i.start_time < now:
+            past.append(show)
+        else:
+            coming.append(show)
+
+    return past, coming
+
+
+def _with_shows(data, shows, fields, now):
+    past, coming = split_shows(shows, fields, now)
+    data.update({
+        "past_shows": past,
+        "upcoming_shows": coming,
+        "past_shows_count": len(past),
+        "upcoming_shows_count": len(coming)
+    })
+    return data
+
+
+VENUE_SHOW_FIELDS = ('artist_id', 'artist_name', 'artist_image_link', 'start_time')
+ARTIST_SHOW_FIELDS = ('venue_id', 'venue_name', 'venue_image_link', 'start_time')
+SHOW_FIELDS = ('venue_id', 'venue_name', 'artist_id', 'artist_name',
+               'artist_image_link', 'start_time')
+
+# detail keys that need the entity's shows loaded
+SHOW_KEYS = ('past_shows', 'upcoming_shows', 'past_shows_count',
+             'upcoming_shows_count')
+
+
+def venue_payload(venue, now, shows=True):
+    data = {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": venue.genres,
+        "address": venue.address,
+        "city": venue.city,
+        "state": venue.state,
+        "phone": venue.phone,
+        "website": venue.website,
+        "facebook_link": venue.facebook_link,
+        "seeking_description": venue.seeking_description,
+        "image_link": venue.image_link
+    }
+    if shows:
+        _with_shows(data, venue.venue_show, VENUE_SHOW_FIELDS, now)
+    return data
+
+
+def artist_payload(artist, now, shows=True):
+    data = {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": artist.genres,
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "website": artist.website,
+        "facebook_link": artist.facebook_link,
+        "seeking_description": artist.seeking_description,
+        "image_link": artist.image_link
+    }
+    if shows:
+        _with_shows(data, artist.artist_show, ARTIST_SHOW_FIELDS, now)
+    return data
+
+
+def minutes(duration):
+    # a show's duration as the whole minutes the forms and importer take
+    return int(duration.total_seconds() // 60)
+
+
+def show_payload(show, fields=SHOW_FIELDS):
+    return {f: getattr(show, f) for f in fields}
@@ -0,0 +1,64 @@
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+# Venue and artist search backed by the indexes created in migration
+# 2b7e4c1d9a0f: a GIN trigram index over the combined search text (so
+# partial, case-insensitive matches like "Hop" still work without a seq
+# scan) and a GIN tsvector index for whole-word matches and ranking.
+
+from sqlalchemy import func, or_, desc
+
+
+def _vocabulary(model):
+    # state and genre names from their ids (migration a7d3c9f1b284)
+    return (func.fyyur_state_code(model.state),
+            func.fyyur_genre_names(model.genres))
+
+
+def search_text(model):
+    # must match the indexed expression exactly for postgres to use it
+    return func.fyyur_search_text(model.name, model.city, *_vocabulary(model))
+
+
+def search_document(model):
+    return func.fyyur_search_document(model.name, model.city, *_vocabulary(model))
+
+
+def escape_like(term):
+    # backslash is postgres' default LIKE escape character
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search(model, term, limit):
+    # returns up to `limit` (id, name, upcoming_shows_count) rows ordered by
+    # relevance
+    term = term.strip()
+    query = model.query.with_entities(model.id, model.name,
+                                      model.upcoming_shows_count)
+    if not term:
+        return query.order_by(model.name, model.id).limit(limit).all()
+
+    ts_query = func.plainto_tsquery('simple', term)
+    rank = (func.ts_rank(search_document(model), ts_query)
+            + func.similarity(model.name, term))
+
+    return query.filter(or_(
+        search_text(model).ilike(f'%{escape_like(term.lower())}%'),
+        search_document(model).op('@@')(ts_query)
+    )).order_by(desc(rank), model.name, model.id).limit(limit).all()
+
+
+def search_results(model, term, limit):
+    hits = search(model, term, limit)
+    data = []
+    for h in hits:
+        data.append({
+            "name": h.name,
+            "id": h.id,
+            "num_upcoming_shows": h.upcoming_shows_count
+        })
+
+    return {
+        "count": len(data),
+        "data": data
+    }
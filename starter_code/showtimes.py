@@ -0,0 +1,67 @@
+#----------------------------------------------------------------------------#
+# Date-range show queries.
+#----------------------------------------------------------------------------#
+# /shows?from=2026-10-23&to=2026-10-25&city=San Francisco and the .ics feeds
+# read shows through the same range query. `from` and `to` are ISO dates or
+# datetimes; a plain date as `to` includes that whole day. The range is a
+# condition on start_time, served by ix_shows_start_time_show_id, or by
+# ix_shows_venue_id_start_time / ix_shows_artist_id_start_time when scoped
+# to one venue or artist; the city scope goes through ix_venues_city.
+
+from datetime import date, datetime, timedelta
+
+from flask import request
+from sqlalchemy import false
+
+from choices import STATES
+
+
+SCOPES = ('venue_id', 'artist_id', 'city', 'state')
+
+
+def parse_bound(value, end=False):
+    # raises ValueError for anything but an ISO date or datetime
+    if not value:
+        return None
+    if len(value) == 10:
+        day = date.fromisoformat(value)
+        return datetime.combine(day + timedelta(days=1) if end else day,
+                                datetime.min.time())
+    return datetime.fromisoformat(value)
+
+
+def selected():
+    # the range and scope of the current request; raises ValueError
+    chosen = {s: request.args.get(s) or None for s in SCOPES}
+    for s in ('venue_id', 'artist_id'):
+        if chosen[s] is not None:
+            chosen[s] = int(chosen[s])
+    chosen['from'] = parse_bound(request.args.get('from'))
+    chosen['to'] = parse_bound(request.args.get('to'), end=True)
+    return chosen
+
+
+def between(query, shows, start=None, end=None):
+    # start <= start_time < end; either bound may be open
+    if start is not None:
+        query = query.filter(shows.start_time >= start)
+    if end is not None:
+        query = query.filter(shows.start_time < end)
+    return query
+
+
+def scoped(query, shows, venue_model, chosen):
+    query = between(query, shows, chosen['from'], chosen['to'])
+    if chosen['venue_id'] is not None:
+        query = query.filter(shows.venue_id == chosen['venue_id'])
+    if chosen['artist_id'] is not None:
+        query = query.filter(shows.artist_id == chosen['artist_id'])
+    if chosen['city'] or chosen['state']:
+        query = query.join(venue_model, venue_model.id == shows.venue_id)
+        if chosen['city']:
+            query = query.filter(venue_model.city == chosen['city'])
+        if chosen['state']:
+            # as in facets.py, a state outside the vocabulary matches nothing
+            query = query.filter(venue_model.state == chosen['state']
+                                 if chosen['state'] in STATES else false())
+    return query
@@ -0,0 +1,133 @@
+#----------------------------------------------------------------------------#
+# Slow query log.
+#----------------------------------------------------------------------------#
+# Statements slower than SLOW_QUERY_SECONDS are written to SLOW_QUERY_LOG
+# with the route that ran them, their bind parameters and, for SELECTs, the
+# EXPLAIN (ANALYZE, BUFFERS) plan, e.g.
+#
+#   1.204s GET /venues/search (search_venues)
+#   SELECT ... WHERE venues.name ILIKE %(name_1)s ...
+#   parameters: {'name_1': '%hop%'}
+#   Seq Scan on venues  (cost=0.00..1234.00 rows=...) (actual time=...)
+#   ...
+#
+# EXPLAIN ANALYZE runs the statement a second time, so it is sampled
+# (SLOW_QUERY_SAMPLE_RATE) and rate limited (SLOW_QUERY_EXPLAINS_PER_MINUTE),
+# and only ever applied to SELECTs. Log lines are rate limited too
+# (SLOW_QUERIES_PER_MINUTE); what a limit drops is counted in the next entry.
+
+import logging
+import random
+import threading
+import time
+from logging import Formatter, FileHandler
+
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class RateLimit(object):
+    # at most `per_minute` events in any rolling 60 seconds
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self._lock = threading.Lock()
+        self._times = []
+
+    def allow(self):
+        now = time.monotonic()
+        with self._lock:
+            self._times = [t for t in self._times if now - t < 60]
+            if len(self._times) >= self.per_minute:
+                return False
+            self._times.append(now)
+            return True
+
+
+def _route():
+    if has_request_context():
+        return f'{request.method} {request.path} ({request.endpoint})'
+    return 'cli'
+
+
+def _truncate(text, size=2000):
+    return text if len(text) <= size else text[:size] + '...'
+
+
+class SlowQueryLog(object):
+
+    def __init__(self, app=None):
+        self.logger = logging.getLogger('fyyur.slow_query')
+        self.suppressed = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.threshold = app.config['SLOW_QUERY_SECONDS']
+        self.sample_rate = app.config['SLOW_QUERY_SAMPLE_RATE']
+        self.explain = app.config['SLOW_QUERY_EXPLAIN']
+        self.lines = RateLimit(app.config['SLOW_QUERIES_PER_MINUTE'])
+        self.explains = RateLimit(app.config['SLOW_QUERY_EXPLAINS_PER_MINUTE'])
+        self._lock = threading.Lock()
+        if not self.threshold:
+            return
+
+        path = app.config.get('SLOW_QUERY_LOG')
+        if path and not self.logger.handlers:
+            handler = FileHandler(path)
+            handler.setFormatter(Formatter('%(asctime)s %(message)s'))
+            self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+
+        # engine-wide listeners, registered once however many apps are made
+        if not event.contains(Engine, 'after_cursor_execute', self._after_cursor):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor)
+        app.extensions['slow_query_log'] = self
+
+    def _before_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('slowlog_started', []).append(time.perf_counter())
+
+    def _after_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['slowlog_started'].pop()
+        if elapsed < self.threshold:
+            return
+        if not self.lines.allow():
+            with self._lock:
+                self.suppressed += 1
+            return
+        with self._lock:
+            suppressed, self.suppressed = self.suppressed, 0
+
+        entry = [f'{elapsed:.3f}s {_route()}', statement.strip(),
+                 f'parameters: {_truncate(repr(parameters))}']
+        if (self.explain and not executemany
+                and statement.lstrip()[:6].upper() == 'SELECT'
+                and random.random() < self.sample_rate
+                and self.explains.allow()):
+            entry.append(self.plan(conn, statement, parameters))
+        if suppressed:
+            entry.append(f'({suppressed} slow queries not logged, rate limit)')
+        self.logger.info('\n'.join(entry))
+
+    def plan(self, conn, statement, parameters):
+        # runs on the statement's own connection and transaction, so it sees
+        # the same data; the raw DBAPI cursor keeps it out of these events and
+        # the savepoint keeps a failed EXPLAIN from aborting the transaction
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute('SAVEPOINT fyyur_explain')
+            try:
+                cursor.execute('EXPLAIN (ANALYZE, BUFFERS) ' + statement, parameters)
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+            except Exception as e:
+                cursor.execute('ROLLBACK TO SAVEPOINT fyyur_explain')
+                plan = f'EXPLAIN failed: {e}'
+            cursor.execute('RELEASE SAVEPOINT fyyur_explain')
+            return plan
+        except Exception as e:
+            # never let the diagnostics break the request itself
+            return f'EXPLAIN failed: {e}'
+        finally:
+            cursor.close()
@@ -0,0 +1,26 @@
+import sys
+
+import pytest
+
+import app
+
+
+@pytest.mark.parametrize('argv, expected', [
+    (['flask', 'db', 'upgrade'], True),
+    (['flask', '--app', 'app', 'db', 'upgrade'], True),
+    (['flask', 'run'], False),
+    (['flask', 'import', 'shows', 'db.csv'], False),
+    (['flask', 'shows', 'rollover'], False),
+    (['flask', '--app', 'db', 'run'], False),
+    (['flask'], False),
+])
+def test_only_flask_db_loads_flask_migrate(monkeypatch, argv, expected):
+    monkeypatch.setenv('FLASK_RUN_FROM_CLI', 'true')
+    monkeypatch.setattr(sys, 'argv', argv)
+    assert app.running_db_command() is expected
+
+
+def test_outside_the_cli_flask_migrate_is_not_loaded(monkeypatch):
+    monkeypatch.delenv('FLASK_RUN_FROM_CLI', raising=False)
+    monkeypatch.setattr(sys, 'argv', ['gunicorn', 'db'])
+    assert app.running_db_command() is False
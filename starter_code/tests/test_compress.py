@@ -0,0 +1,82 @@
+import gzip
+
+import pytest
+from flask import Flask
+
+import compress
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['COMPRESS_MIN_SIZE'] = 100
+    compress.Compression(app)
+
+    @app.route('/page')
+    def page():
+        return 'Fyyur ' * 100
+
+    @app.route('/small')
+    def small():
+        return 'Fyyur'
+
+    return app
+
+
+def negotiate(app, accept):
+    with app.test_request_context(headers={'Accept-Encoding': accept}):
+        return app.extensions['compression'].negotiate()
+
+
+def test_negotiate_gzip_only(app, monkeypatch):
+    monkeypatch.setattr(compress, 'brotli', None)
+    assert negotiate(app, 'gzip, deflate, br') == 'gzip'
+    assert negotiate(app, 'br') is None
+    assert negotiate(app, 'gzip;q=0') is None
+    assert negotiate(app, '') is None
+
+
+def test_negotiate_prefers_the_highest_q(app):
+    pytest.importorskip('brotli')
+    # a tie goes to brotli
+    assert negotiate(app, 'gzip, br') == 'br'
+    assert negotiate(app, 'gzip, br;q=0.5') == 'gzip'
+
+
+def test_response_is_compressed(app, monkeypatch):
+    monkeypatch.setattr(compress, 'brotli', None)
+    response = app.test_client().get('/page', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data) == b'Fyyur ' * 100
+
+
+def test_small_or_unaccepted_responses_are_left_alone(app):
+    client = app.test_client()
+    response = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    response = client.get('/page', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+
+def test_cacheable_bodies_are_compressed_once(app, monkeypatch):
+    monkeypatch.setattr(compress, 'brotli', None)
+    client = app.test_client()
+    for _ in range(3):
+        client.get('/page', headers={'Accept-Encoding': 'gzip'})
+    stats = app.extensions['compression'].cache.stats()
+    assert (stats['misses'], stats['hits'], stats['entries']) == (1, 2, 1)
+
+
+def test_body_cache_evicts_least_recently_used():
+    cache = compress.BodyCache(10)
+    cache.set('a', b'1234')
+    cache.set('b', b'1234')
+    cache.get('a')
+    cache.set('c', b'1234')
+    assert cache.get('b') is None
+    assert cache.get('a') == b'1234' and cache.get('c') == b'1234'
+    assert cache.size == 8
+    cache.set('d', b'x' * 11)
+    assert cache.get('d') is None
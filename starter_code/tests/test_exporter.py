@@ -0,0 +1,34 @@
+import csv
+import json
+from datetime import datetime, timedelta
+
+import exporter
+import importer
+
+
+COLUMNS = exporter.COLUMNS['shows']
+ROW = (7, 2, 3, datetime(2026, 10, 23, 19, 30), timedelta(minutes=90),
+       'Guns N Petals', None, 'The Musical Hop', None, datetime(2026, 10, 1))
+
+
+def test_csv_export_imports_again_with_its_duration():
+    lines = list(exporter.csv_lines([ROW], COLUMNS))
+    row = next(csv.DictReader(lines))
+    assert row['duration'] == '90'
+    assert importer.clean_show(row) == (7, 2, 3, datetime(2026, 10, 23, 19, 30), 90)
+
+
+def test_jsonl_export_imports_again_with_its_duration():
+    row = json.loads(next(exporter.jsonl_lines([ROW], COLUMNS)))
+    assert row['duration'] == 90
+    assert importer.clean_show(row) == (7, 2, 3, datetime(2026, 10, 23, 19, 30), 90)
+
+
+def test_since_reaches_back_by_the_overlap():
+    from app import create_app
+    from models import Shows
+    since = datetime(2026, 10, 18, 12, 0)
+    with create_app({'TESTING': True}).app_context():
+        query = exporter.export_query(Shows, ['show_id'], since, overlap=timedelta(hours=1))
+        bound = query.statement.compile().params
+    assert datetime(2026, 10, 18, 11, 0) in bound.values()
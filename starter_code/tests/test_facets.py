@@ -0,0 +1,52 @@
+from collections import namedtuple
+
+import facets
+from choices import GENRES
+
+
+Row = namedtuple('Row', 'grouping genre state city count')
+
+
+def grouping(grouped):
+    # what postgres' GROUPING(genre, state, city) returns for a grouping set:
+    # one bit per argument, the first the most significant, set when that
+    # column is not grouped
+    mask = 0
+    for column in ('genre', 'state', 'city'):
+        mask = mask << 1 | (column not in grouped)
+    return mask
+
+
+def test_grouping_bits_name_the_grouped_facet():
+    assert facets.GROUPING_BITS == {grouping({f}): f for f in facets.FACETS}
+
+
+def test_tally_sorts_each_facet_by_count():
+    jazz, rock = GENRES.id('Jazz'), GENRES.id('Rock n Roll')
+    rows = [
+        Row(grouping({'genre'}), jazz, None, None, 2),
+        Row(grouping({'genre'}), rock, None, None, 5),
+        Row(grouping({'state'}), None, 'CA', None, 4),
+        Row(grouping({'state'}), None, 'NY', None, 4),
+        Row(grouping({'city'}), None, None, 'Oakland', 1),
+    ]
+    assert facets.tally(rows) == {
+        'genre': [('Rock n Roll', 5), ('Jazz', 2)],
+        'state': [('CA', 4), ('NY', 4)],
+        'city': [('Oakland', 1)],
+    }
+
+
+def test_tally_skips_the_null_groups():
+    # entities without genres (the appended NULL) or without a city
+    rows = [
+        Row(grouping({'genre'}), None, None, None, 3),
+        Row(grouping({'city'}), None, None, None, 1),
+    ]
+    assert facets.tally(rows) == {'genre': [], 'state': [], 'city': []}
+
+
+def test_tally_keeps_the_most_frequent():
+    rows = [Row(grouping({'city'}), None, None, f'City {n}', n) for n in range(30)]
+    cities = facets.tally(rows, limit=3)['city']
+    assert cities == [('City 29', 29), ('City 28', 28), ('City 27', 27)]
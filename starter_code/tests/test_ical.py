@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import ical
+
+
+def unfold(text):
+    return text.replace('\r\n ', '')
+
+
+def octets(text):
+    return [len(line.encode('utf-8')) for line in text.split('\r\n') if line]
+
+
+def test_short_line_is_not_folded():
+    assert ical.fold('SUMMARY:Jazz night') == 'SUMMARY:Jazz night\r\n'
+    assert ical.fold('X' * 75) == 'X' * 75 + '\r\n'
+
+
+def test_long_line_folds_at_75_octets():
+    line = 'SUMMARY:' + 'x' * 200
+    folded = ical.fold(line)
+    assert max(octets(folded)) == 75
+    assert all(part.startswith(' ') for part in folded.split('\r\n')[1:-1])
+    assert unfold(folded) == line + '\r\n'
+
+
+def test_fold_never_splits_a_character():
+    for text in ('é' * 100, 'a' + '🎷' * 40, 'ab' + '日本' * 50):
+        line = 'LOCATION:' + text
+        folded = ical.fold(line)
+        assert max(octets(folded)) <= 75
+        # every piece decoded on its own, so none holds half a character
+        assert unfold(folded) == line + '\r\n'
+
+
+def test_escape():
+    assert ical.escape('Rock, Roll; back\\slash\nnext') == r'Rock\, Roll\; back\\slash\nnext'
+    assert ical.escape(None) == ''
+
+
+def test_feed_lines():
+    start = datetime(2026, 10, 23, 19, 30)
+    shows = [
+        SimpleNamespace(show_id=1, start_time=start, duration=timedelta(hours=2),
+                        artist_name='Guns N Petals', venue_name='The Musical Hop'),
+        SimpleNamespace(show_id=2, start_time=None, duration=timedelta(hours=2),
+                        artist_name='Unscheduled', venue_name='Nowhere'),
+    ]
+    feed = ''.join(ical.feed_lines('The Musical Hop', shows, 'fyyur.example'))
+    lines = unfold(feed).split('\r\n')
+    assert lines[0] == 'BEGIN:VCALENDAR' and lines[-2] == 'END:VCALENDAR'
+    assert lines.count('BEGIN:VEVENT') == 1
+    assert 'UID:show-1@fyyur.example' in lines
+    assert 'DTSTART:20261023T193000' in lines
+    assert 'DTEND:20261023T213000' in lines
+    assert 'SUMMARY:Guns N Petals' in lines
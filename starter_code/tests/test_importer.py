@@ -0,0 +1,39 @@
+import time
+from datetime import datetime
+
+import pytest
+
+import importer
+
+
+@pytest.fixture
+def local_zone(monkeypatch):
+    # the app's local time, which naive start times are in
+    def use(zone):
+        monkeypatch.setenv('TZ', zone)
+        time.tzset()
+    yield use
+    monkeypatch.undo()
+    time.tzset()
+
+
+def start_time(value):
+    return importer.clean_show({'artist_id': '1', 'venue_id': '2',
+                                'start_time': value})[3]
+
+
+def test_naive_start_time_is_kept():
+    assert start_time('2024-05-01T20:00') == datetime(2024, 5, 1, 20, 0)
+
+
+def test_start_time_with_an_offset_becomes_local_time(local_zone):
+    local_zone('America/New_York')
+    assert start_time('2024-05-01T20:00-05:00') == datetime(2024, 5, 1, 21, 0)
+    assert start_time('2024-05-02T01:00Z') == datetime(2024, 5, 1, 21, 0)
+    local_zone('UTC')
+    assert start_time('2024-05-01T20:00-05:00') == datetime(2024, 5, 2, 1, 0)
+
+
+def test_invalid_start_time_is_an_invalid_row():
+    with pytest.raises(importer.InvalidRow):
+        start_time('next friday')
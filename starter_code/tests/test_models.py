@@ -0,0 +1,70 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from models import Venue, Artist
+
+
+# A scratch postgres database for the tests that need the real schema
+# (triggers, cascades). It is wiped: never point this at real data.
+DATABASE_URL = os.environ.get('FYYUR_TEST_DATABASE_URL')
+needs_postgres = pytest.mark.skipif(
+    not DATABASE_URL, reason='set FYYUR_TEST_DATABASE_URL to a scratch postgres database')
+
+
+@pytest.mark.parametrize('relationship', [Venue.venue_show, Artist.artist_show])
+def test_deleting_a_parent_leaves_its_shows_to_the_database(relationship):
+    # without these the session nulls the shows' foreign key before the
+    # DELETE, so ON DELETE CASCADE and the counter triggers never run
+    prop = relationship.property
+    assert prop.passive_deletes is True
+    assert prop.cascade.delete
+
+
+@pytest.fixture
+def migrated_app():
+    from flask_migrate import Migrate, upgrade
+    from app import create_app, db
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': DATABASE_URL, 'TESTING': True,
+                      'PAGE_CACHE_BACKEND': 'null'})
+    Migrate(app, db)
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text('DROP SCHEMA public CASCADE'))
+            conn.execute(text('CREATE SCHEMA public'))
+        upgrade(directory=os.path.join(os.path.dirname(__file__), '..', 'migrations'))
+        yield app, db
+        db.session.remove()
+
+
+@needs_postgres
+def test_deleting_a_venue_removes_its_shows_and_their_counts(migrated_app):
+    from models import Shows
+    app, db = migrated_app
+    now = datetime.now()
+
+    venue, other = Venue(name='The Musical Hop'), Venue(name='Park Square')
+    artist = Artist(name='Guns N Petals')
+    db.session.add_all([venue, other, artist])
+    db.session.flush()
+    db.session.add_all([
+        Shows(venue_id=venue.id, artist_id=artist.id, start_time=now + timedelta(days=10)),
+        Shows(venue_id=venue.id, artist_id=artist.id, start_time=now - timedelta(days=10)),
+        Shows(venue_id=other.id, artist_id=artist.id, start_time=now + timedelta(days=20)),
+    ])
+    db.session.commit()
+    venue_id, artist_id = venue.id, artist.id
+    db.session.expire_all()
+    assert (artist.upcoming_shows_count, artist.past_shows_count) == (2, 1)
+
+    response = app.test_client().delete(f'/venues/{venue_id}')
+    assert response.status_code == 200
+
+    db.session.expire_all()
+    assert Shows.query.filter(Shows.venue_id.is_(None)).count() == 0
+    assert [s.venue_id for s in Shows.query.all()] == [other.id]
+    artist = Artist.query.get(artist_id)
+    assert (artist.upcoming_shows_count, artist.past_shows_count) == (1, 0)
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, String, column
+
+import pagination
+
+
+SHOW_KEYS = (column('start_time', DateTime), column('show_id', Integer))
+ARTIST_KEYS = (column('name', String), column('id', Integer))
+
+
+def test_cursor_round_trip():
+    values = [datetime(2026, 10, 23, 19, 30), 42]
+    cursor = pagination.encode_cursor(values)
+    assert pagination.decode_cursor(cursor, SHOW_KEYS) == values
+
+
+def test_cursor_is_url_safe_without_padding():
+    cursor = pagination.encode_cursor(['Guns N Petals?>', 1])
+    assert '=' not in cursor
+    assert set(cursor) <= set('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_')
+    assert pagination.decode_cursor(cursor, ARTIST_KEYS) == ['Guns N Petals?>', 1]
+
+
+def test_cursor_keeps_null_keys():
+    cursor = pagination.encode_cursor([None, 7])
+    assert pagination.decode_cursor(cursor, ARTIST_KEYS) == [None, 7]
+
+
+def test_missing_or_malformed_cursor_is_the_first_page():
+    assert pagination.decode_cursor(None, ARTIST_KEYS) is None
+    assert pagination.decode_cursor('', ARTIST_KEYS) is None
+    assert pagination.decode_cursor('not a cursor!', ARTIST_KEYS) is None
+    assert pagination.decode_cursor(pagination.encode_cursor(['a']), ARTIST_KEYS) is None
+    assert pagination.decode_cursor(pagination.encode_cursor(['yesterday', 1]),
+                                    SHOW_KEYS) is None
+
+
+def test_page_size():
+    assert pagination.page_size(None, 20, 100) == 20
+    assert pagination.page_size(0, 20, 100) == 20
+    assert pagination.page_size(5, 20, 100) == 5
+    assert pagination.page_size(500, 20, 100) == 100
@@ -0,0 +1,14 @@
+#----------------------------------------------------------------------------#
+# WSGI entry point.
+#----------------------------------------------------------------------------#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# With preload_app the app is built once in the gunicorn master and the
+# workers fork from it, sharing its memory. Nothing may hold a database
+# connection across that fork, so the pools are emptied here and again in
+# each worker (see post_fork in gunicorn.conf.py).
+
+from app import create_app, dispose_engines
+
+app = create_app()
+dispose_engines(app)